@@ -0,0 +1,149 @@
+import importlib.util
+import logging
+
+from telegram import Update
+from telegram.ext import (
+    Application, CallbackQueryHandler, CommandHandler, ConversationHandler, InlineQueryHandler, MessageHandler, filters
+)
+
+from config import get_settings
+from database import get_catalog_index, get_engine, get_roles, run_db
+from handlers import (
+    NAME, PHONE, EMAIL, ADDRESS, TEXT_ROUTER, TEXT_ROUTER_GROUP,
+    start_command, admin_command, name_handler, phone_handler, email_handler, address_handler,
+    handle_user_info, handle_help, handle_contact, back_to_main,
+    broadcast_command, grant_admin_command, revoke_admin_command, admins_command,
+    reserve_command, cart_command, checkout_command, clear_cart_command, inline_query_handler, photos_command,
+    resume_broadcasts, refresh_roles, refresh_catalog_snapshot, send_appointment_reminders, release_reservations,
+    process_product_images, log_metrics_summary
+)
+from metrics import metrics
+from persistence import SQLPersistence
+from update_processor import ChatOrderedUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+###########################################
+# FÁBRICA DE LA APLICACIÓN
+###########################################
+
+async def post_init(application):
+    """Tareas que se ejecutan una vez que la aplicación está inicializada"""
+    await run_db(get_roles().refresh)
+    await run_db(get_catalog_index().refresh)
+    await resume_broadcasts(application)
+
+# Tipos de actualización que maneja el bot: no se suscribe al resto
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY, Update.INLINE_QUERY]
+
+def schedule_jobs(application):
+    """Programa los trabajos periódicos en la cola de trabajos de la aplicación"""
+    settings = get_settings()
+    if application.job_queue is None:
+        logger.warning("JobQueue no disponible: instala python-telegram-bot[job-queue] para los recordatorios")
+        return
+    application.job_queue.run_repeating(
+        refresh_roles, interval=settings.role_refresh_interval, first=settings.role_refresh_interval,
+        name="refresh_roles"
+    )
+    application.job_queue.run_repeating(
+        send_appointment_reminders, interval=settings.reminder_interval, first=10, name="appointment_reminders"
+    )
+    application.job_queue.run_repeating(
+        refresh_catalog_snapshot, interval=settings.catalog_snapshot_interval,
+        first=settings.catalog_snapshot_interval, name="refresh_catalog_snapshot"
+    )
+    application.job_queue.run_repeating(
+        process_product_images, interval=settings.image_pipeline_interval, first=30, name="product_images"
+    )
+    application.job_queue.run_repeating(
+        release_reservations, interval=settings.reservation_release_interval,
+        first=settings.reservation_release_interval, name="release_reservations"
+    )
+    if settings.metrics_enabled and settings.metrics_log_interval > 0:
+        application.job_queue.run_repeating(
+            log_metrics_summary, interval=settings.metrics_log_interval, first=settings.metrics_log_interval,
+            name="metrics_summary"
+        )
+
+def bot_http_version(settings):
+    """Versión de HTTP para la Bot API: HTTP/2 multiplexa las llamadas en una sola conexión"""
+    if settings.bot_http_version != "auto":
+        return settings.bot_http_version
+    return "2" if importlib.util.find_spec("h2") is not None else "1.1"
+
+def build_application(token=None, request=None, updater=True, persistent=True, concurrent_updates=None):
+    """Crea la aplicación de Telegram con todos los manejadores registrados.
+    
+    `request` permite sustituir el cliente HTTP de la Bot API (por ejemplo por
+    un Telegram falso) y `updater=False` la prepara para recibir
+    actualizaciones por webhook en lugar de por polling. Con `persistent` las
+    conversaciones a medias y user_data sobreviven a los reinicios.
+    `concurrent_updates` sustituye a CONCURRENT_UPDATES de la configuración;
+    también admite un BaseUpdateProcessor ya creado.
+    """
+    settings = get_settings()
+    builder = Application.builder().token(token or settings.telegram_token)
+    if request is not None:
+        builder = builder.request(request)
+    else:
+        # Conexiones persistentes suficientes para las llamadas simultáneas de
+        # todas las actualizaciones en curso
+        builder = (
+            builder.connection_pool_size(settings.bot_connection_pool_size)
+            .pool_timeout(settings.bot_pool_timeout)
+            .http_version(bot_http_version(settings))
+        )
+    if not updater:
+        builder = builder.updater(None)
+    concurrent_updates = concurrent_updates or settings.concurrent_updates
+    if isinstance(concurrent_updates, int):
+        # Chats distintos en paralelo; los pasos de una conversación, en orden
+        concurrent_updates = ChatOrderedUpdateProcessor(concurrent_updates) if concurrent_updates > 1 else None
+    if concurrent_updates is not None:
+        builder = builder.concurrent_updates(concurrent_updates)
+    if persistent:
+        builder = builder.persistence(
+            SQLPersistence(get_engine(), update_interval=settings.persistence_update_interval)
+        )
+    application = builder.post_init(post_init).build()
+    schedule_jobs(application)
+    
+    # 1. PRIMERO: Registrar comandos y callbacks específicos
+    application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("grant_admin", grant_admin_command))
+    application.add_handler(CommandHandler("revoke_admin", revoke_admin_command))
+    application.add_handler(CommandHandler("admins", admins_command))
+    application.add_handler(CommandHandler("reserve", reserve_command))
+    application.add_handler(CommandHandler("cart", cart_command))
+    application.add_handler(CommandHandler("checkout", checkout_command))
+    application.add_handler(CommandHandler("clear_cart", clear_cart_command))
+    application.add_handler(CommandHandler("photos", photos_command))
+    application.add_handler(InlineQueryHandler(inline_query_handler))
+    application.add_handler(CallbackQueryHandler(back_to_main, pattern="^back_to_main$"))
+    application.add_handler(CallbackQueryHandler(handle_help, pattern="^help$"))
+    application.add_handler(CallbackQueryHandler(handle_contact, pattern="^contact$"))
+    application.add_handler(CallbackQueryHandler(handle_user_info, pattern="^user_info$"))
+    
+    # 2. SEGUNDO: Registrar el ConversationHandler
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("start", start_command)],
+        states={
+            NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, name_handler)],
+            PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, phone_handler)],
+            EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, email_handler)],
+            ADDRESS: [MessageHandler(filters.TEXT & ~filters.COMMAND, address_handler)],
+        },
+        fallbacks=[CommandHandler("cancel", lambda u, c: ConversationHandler.END)],
+        name="user_registration",
+        persistent=persistent
+    )
+    application.add_handler(conv_handler)
+    
+    # 3. Botones del teclado principal, en su propio grupo (se evalúa antes que el resto)
+    application.add_handler(TEXT_ROUTER.build_handler(), group=TEXT_ROUTER_GROUP)
+    
+    if settings.metrics_enabled:
+        metrics.instrument_application(application)
+    return application
@@ -0,0 +1,819 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import functools
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+from keyboards import (
+    Keyboards, BUTTON_INFO, BUTTON_CATALOG, BUTTON_APPOINTMENT, BUTTON_HELP, BUTTON_CONTACT, BUTTON_ADMIN
+)
+from catalog_index import CatalogSnapshot
+from metrics import metrics
+from router import TextRouter
+
+EXAMPLE_URL = "https://example.com"
+
+
+def measure(func, number):
+    """Mide el tiempo medio por llamada y la memoria máxima que reserva una llamada"""
+    func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "us_per_call": elapsed / number * 1e6,
+        "peak_bytes_per_call": peak - current,
+    }
+
+
+def _legacy_start_keyboards():
+    # Lo que hacía /start en cada actualización antes de precalcular los teclados
+    main = ReplyKeyboardMarkup([
+        [KeyboardButton("📋 Información")],
+        [KeyboardButton("🛍️ Catálogo"), KeyboardButton("📅 Agendar Cita")],
+        [KeyboardButton("❓ Ayuda"), KeyboardButton("📞 Contacto")],
+    ], resize_keyboard=True)
+    webapp = InlineKeyboardMarkup([
+        [InlineKeyboardButton("🛍️ Ver Catálogo", web_app={"url": f"{EXAMPLE_URL}/catalog"})],
+        [InlineKeyboardButton("📅 Agendar Cita", web_app={"url": f"{EXAMPLE_URL}/appointments"})],
+        [InlineKeyboardButton("Volver", callback_data="back_to_main")],
+    ])
+    return main, webapp
+
+
+def bench_keyboards(number):
+    """Teclados construidos en cada actualización frente a precalculados"""
+    keyboards = Keyboards(f"{EXAMPLE_URL}/catalog", f"{EXAMPLE_URL}/appointments", f"{EXAMPLE_URL}/admin")
+    return {
+        "rebuilt_per_update": measure(_legacy_start_keyboards, number),
+        "precomputed": measure(lambda: (keyboards.main_for(False), keyboards.webapp), number),
+    }
+
+
+# Mezcla de mensajes: pulsaciones de botones y texto libre que no coincide
+ROUTER_MESSAGES = [
+    BUTTON_INFO, BUTTON_CATALOG, BUTTON_CONTACT, BUTTON_ADMIN,
+    "Hola, ¿tenéis camisas de lino en talla M?",
+    "gracias",
+    "Información de envíos, por favor",
+    "Quiero información sobre el catálogo de invierno y los horarios de contacto " * 3,
+    "👍",
+]
+
+
+def _legacy_route(text):
+    # Cadena de comprobaciones por subcadena que usaba handle_text_messages
+    if "Panel Admin" in text:
+        return "admin"
+    if "Información" in text:
+        return "info"
+    elif "Catálogo" in text:
+        return "catalog"
+    elif "Agendar Cita" in text:
+        return "appointment"
+    elif "Ayuda" in text:
+        return "help"
+    elif "Contacto" in text:
+        return "contact"
+    return None
+
+
+def bench_router(number):
+    """Enrutado de texto por cadena de subcadenas frente a diccionario de etiquetas"""
+    router = TextRouter()
+    for label in (BUTTON_INFO, BUTTON_CATALOG, BUTTON_APPOINTMENT, BUTTON_HELP, BUTTON_CONTACT, BUTTON_ADMIN):
+        router.add(label, label)
+    matching = ROUTER_MESSAGES[:4]
+    non_matching = ROUTER_MESSAGES[4:]
+    return {
+        "legacy_matching": measure(lambda: [_legacy_route(t) for t in matching], number),
+        "legacy_non_matching": measure(lambda: [_legacy_route(t) for t in non_matching], number),
+        "router_matching": measure(lambda: [router.resolve(t) for t in matching], number),
+        "router_non_matching": measure(lambda: [router.resolve(t) for t in non_matching], number),
+        # El enrutado por subcadena disparaba botones con texto libre
+        "legacy_false_positives": sum(_legacy_route(t) is not None for t in non_matching),
+        "router_false_positives": sum(router.resolve(t) is not None for t in non_matching),
+    }
+
+
+###########################################
+# CARGA SOBRE LA APLICACIÓN COMPLETA
+###########################################
+
+# Telegram IDs de los usuarios sintéticos (dentro del rango de Integer en PostgreSQL)
+LOAD_TEST_ID_BASE = 2_000_000_000
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 0.50) * 1000,
+        "p99_ms": _percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def _user_script(telegram_id):
+    """Actualizaciones que envía un usuario: registro, botones y botones en línea"""
+    from fake_telegram import callback_update, message_update
+
+    messages = [
+        ("start_new", "/start"),
+        ("registration", "Usuario de prueba"),
+        ("registration", "600000000"),
+        ("registration", f"{telegram_id}@example.com"),
+        ("registration", "Calle Falsa 123"),
+        ("start_existing", "/start"),
+        ("button", BUTTON_INFO),
+        ("button", BUTTON_CATALOG),
+        ("button", BUTTON_APPOINTMENT),
+        ("button", BUTTON_HELP),
+        ("button", BUTTON_CONTACT),
+    ]
+    for kind, text in messages:
+        yield kind, lambda update_id, text=text: message_update(update_id, telegram_id, text)
+    for data in ("user_info", "help", "contact", "back_to_main"):
+        yield "callback", lambda update_id, data=data: callback_update(update_id, telegram_id, data)
+
+
+async def _run_load(users, concurrency, bot_latency, persistent, concurrent_updates=None, burst=False,
+                    ordered=True):
+    from telegram import Update
+    from telegram.ext import SimpleUpdateProcessor
+    from app import build_application
+    from database import User, get_engine, get_session
+    from fake_telegram import FakeBotRequest
+    from metrics import metrics
+
+    if concurrent_updates and concurrent_updates > 1 and not ordered:
+        # Sin orden por chat, para comparar: así procesa PTB con concurrent_updates=N
+        concurrent_updates = SimpleUpdateProcessor(concurrent_updates)
+    request = FakeBotRequest(latency=bot_latency)
+    application = build_application(
+        token="1:load-test", request=request, updater=False, persistent=persistent,
+        concurrent_updates=concurrent_updates
+    )
+    processor = application.update_processor
+    latencies = {}
+    completed = {}
+    update_ids = iter(range(1, 10 ** 9))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle(kind, update):
+        # Igual que la aplicación: cada actualización pasa por su procesador de actualizaciones
+        start = time.perf_counter()
+        await processor.process_update(update, application.process_update(update))
+        latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        completed.setdefault(update.effective_chat.id, []).append(update.update_id)
+
+    async def simulate(telegram_id):
+        async with semaphore:
+            updates = [
+                (kind, Update.de_json(build(next(update_ids)), application.bot))
+                for kind, build in _user_script(telegram_id)
+            ]
+            if burst:
+                # Todas las actualizaciones del usuario llegan de golpe, como tras una reconexión
+                await asyncio.gather(*(application.create_task(handle(kind, update)) for kind, update in updates))
+            else:
+                # Cada usuario espera la respuesta antes de enviar la siguiente, como en un chat real
+                for kind, update in updates:
+                    await handle(kind, update)
+
+    async with application:
+        queries_before = metrics.snapshot()["db_queries"]
+        start = time.perf_counter()
+        await asyncio.gather(*(simulate(LOAD_TEST_ID_BASE + i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+        queries = metrics.snapshot()["db_queries"] - queries_before
+        if application.persistence:
+            await application.update_persistence()
+
+    session = get_session()
+    try:
+        registered = session.query(User).filter(
+            User.telegram_id.between(LOAD_TEST_ID_BASE, LOAD_TEST_ID_BASE + users - 1)
+        ).count()
+    finally:
+        session.close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "database": get_engine().dialect.name,
+        "users": users,
+        "concurrency": concurrency,
+        "concurrent_updates": getattr(processor, "max_running", processor.max_concurrent_updates),
+        "update_processor": type(processor).__name__,
+        "burst": burst,
+        "bot_latency_ms": bot_latency * 1000,
+        "persistent": persistent,
+        "updates": len(all_latencies),
+        "seconds": elapsed,
+        "updates_per_second": len(all_latencies) / elapsed if elapsed else 0.0,
+        "db_queries_per_update": queries / len(all_latencies) if all_latencies else 0.0,
+        "bot_api_calls": len(request.calls),
+        # Chats cuyas actualizaciones terminaron en otro orden y usuarios que completaron el registro
+        "out_of_order_chats": sum(ids != sorted(ids) for ids in completed.values()),
+        "registered_users": registered,
+        "latency": _latency_summary(all_latencies),
+        "latency_by_kind": {kind: _latency_summary(values) for kind, values in sorted(latencies.items())},
+    }
+
+
+def _delete_load_test_users(users):
+    from sqlalchemy import delete
+    from database import User, get_engine
+
+    with get_engine().begin() as conn:
+        conn.execute(delete(User).where(
+            User.telegram_id.between(LOAD_TEST_ID_BASE, LOAD_TEST_ID_BASE + users - 1)
+        ))
+
+
+@contextlib.contextmanager
+def _benchmark_database(database_url, **environ):
+    """Configura la base de datos de un escenario; nunca se usa la real por defecto.
+
+    `environ` añade variables de entorno a la configuración del escenario.
+    """
+    import config
+    import database
+
+    temp_dir = None
+    if not database_url:
+        temp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(temp_dir.name, 'load_test.sqlite')}"
+    config.load_env()
+    config.configure(config.Settings({**os.environ, **environ, "DATABASE_URL": database_url}))
+    database.init_db()
+    try:
+        yield database
+    finally:
+        database.dispose_engine()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+def bench_pipeline(args):
+    """Actualizaciones sintéticas procesadas por la aplicación real contra un Telegram falso"""
+    with _benchmark_database(args.database_url):
+        # Los usuarios de una ejecución anterior interrumpida harían que /start no registrara
+        _delete_load_test_users(args.users)
+        try:
+            return asyncio.run(_run_load(
+                args.users, args.concurrency, args.bot_latency / 1000, args.persistent,
+                args.concurrent_updates, args.burst, not args.unordered
+            ))
+        finally:
+            _delete_load_test_users(args.users)
+
+
+###########################################
+# RESERVAS DE STOCK CONCURRENTES
+###########################################
+
+LOAD_TEST_CATEGORY = "load-test"
+
+
+def _stock_balance(database, product_ids):
+    """Stock libre, reservado y vendido de cada producto"""
+    from sqlalchemy import func, select
+
+    engine = database.get_engine()
+    with engine.connect() as conn:
+        free = dict(conn.execute(
+            select(database.Product.id, database.Product.stock).where(database.Product.id.in_(product_ids))
+        ).all())
+        held = dict(conn.execute(
+            select(database.StockReservation.product_id, func.sum(database.StockReservation.quantity))
+            .where(database.StockReservation.product_id.in_(product_ids))
+            .group_by(database.StockReservation.product_id)
+        ).all())
+        sold = dict(conn.execute(
+            select(database.OrderItem.product_id, func.sum(database.OrderItem.quantity))
+            .where(database.OrderItem.product_id.in_(product_ids))
+            .group_by(database.OrderItem.product_id)
+        ).all())
+    return {pid: (free[pid], held.get(pid, 0), sold.get(pid, 0)) for pid in product_ids}
+
+
+def _delete_reservation_test_data(database, users):
+    from sqlalchemy import delete, select
+
+    product_ids = select(database.Product.id).where(database.Product.category == LOAD_TEST_CATEGORY)
+    user_ids = select(database.User.id).where(
+        database.User.telegram_id.between(LOAD_TEST_ID_BASE, LOAD_TEST_ID_BASE + users - 1)
+    )
+    order_ids = select(database.Order.id).where(database.Order.user_id.in_(user_ids))
+    with database.get_engine().begin() as conn:
+        conn.execute(delete(database.OrderItem).where(database.OrderItem.order_id.in_(order_ids)))
+        conn.execute(delete(database.Order).where(database.Order.user_id.in_(user_ids)))
+        conn.execute(delete(database.StockReservation).where(database.StockReservation.product_id.in_(product_ids)))
+        conn.execute(delete(database.Product).where(database.Product.category == LOAD_TEST_CATEGORY))
+    _delete_load_test_users(users)
+
+
+def _run_reservations(database, args):
+    from sqlalchemy import insert, select
+
+    users, products, stock = args.concurrency, args.products, args.stock
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        conn.execute(insert(database.User), [
+            {'telegram_id': LOAD_TEST_ID_BASE + i, 'name': f"Carga {i}", 'phone': "600000000",
+             'email': f"carga{i}@example.com", 'address': "Calle Falsa 123"}
+            for i in range(users)
+        ])
+        conn.execute(insert(database.Product), [
+            {'name': f"Producto de carga {i}", 'price': 10.0 + i, 'category': LOAD_TEST_CATEGORY, 'stock': stock}
+            for i in range(products)
+        ])
+        product_ids = conn.execute(
+            select(database.Product.id).where(database.Product.category == LOAD_TEST_CATEGORY)
+        ).scalars().all()
+
+    # La mitad de las reservas caduca al momento y la libera un hilo aparte
+    # mientras los compradores siguen reservando y confirmando pedidos
+    hold = datetime.timedelta(minutes=15)
+    attempts_per_user = args.reservations // users
+    counters = {'reserved': 0, 'rejected': 0, 'orders': 0, 'released': 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def buyer(index):
+        rng = random.Random(index)
+        telegram_id = LOAD_TEST_ID_BASE + index
+        reserved = rejected = orders = 0
+        for attempt in range(attempts_per_user):
+            expires = hold if rng.random() < 0.5 else datetime.timedelta(0)
+            if database.reserve_stock(telegram_id, rng.choice(product_ids), rng.randint(1, 3), expires):
+                reserved += 1
+            else:
+                rejected += 1
+            if attempt % 5 == 4 and database.checkout(telegram_id):
+                orders += 1
+        with lock:
+            counters['reserved'] += reserved
+            counters['rejected'] += rejected
+            counters['orders'] += orders
+
+    def releaser():
+        while not done.is_set():
+            counters['released'] += database.release_expired_reservations(datetime.datetime.utcnow())
+            time.sleep(0.01)
+
+    release_thread = threading.Thread(target=releaser)
+    release_thread.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(buyer, range(users)))
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        release_thread.join()
+    counters['released'] += database.release_expired_reservations(datetime.datetime.utcnow())
+
+    balance = _stock_balance(database, product_ids)
+    attempts = counters['reserved'] + counters['rejected']
+    return {
+        "database": engine.dialect.name,
+        "buyers": users,
+        "products": products,
+        "initial_stock": stock * products,
+        **counters,
+        "attempts_per_second": attempts / elapsed,
+        "reservations_per_second": counters['reserved'] / elapsed,
+        # Unidades vendidas o reservadas por encima del stock inicial
+        "oversold_units": sum(max(0, held + sold - stock) for _, held, sold in balance.values()),
+        "negative_stock_products": sum(1 for free, _, _ in balance.values() if free < 0),
+        # Productos cuyo stock libre + reservado + vendido no cuadra con el inicial
+        "unbalanced_products": sum(1 for free, held, sold in balance.values() if free + held + sold != stock),
+        "units_sold": sum(sold for _, _, sold in balance.values()),
+    }
+
+
+def bench_reservations(args):
+    """Compradores concurrentes reservando, comprando y dejando caducar stock limitado"""
+    with _benchmark_database(args.database_url) as database:
+        _delete_reservation_test_data(database, args.concurrency)
+        try:
+            return _run_reservations(database, args)
+        finally:
+            _delete_reservation_test_data(database, args.concurrency)
+
+
+###########################################
+# BÚSQUEDA EN EL CATÁLOGO
+###########################################
+
+GARMENTS = ["Camisa", "Camiseta", "Pantalón", "Falda", "Vestido", "Chaqueta", "Jersey", "Abrigo", "Blusa", "Sudadera"]
+MATERIALS = ["algodón", "lino", "lana", "seda", "vaquero", "poliéster", "punto", "pana"]
+COLORS = ["negro", "blanco", "azul marino", "rojo", "verde oliva", "beige", "gris", "rosa"]
+FITS = ["entallado", "holgado", "recto", "oversize", "de verano", "de invierno", "clásico", "deportivo"]
+
+# Búsquedas frecuentes, raras, con acentos omitidos, prefijos y sin resultados
+SEARCH_QUERIES = ["camisa", "pantalon lana", "vestido seda rojo", "chaq", "abrigo pana 12", "zapatos"]
+
+
+def _synthetic_catalog(size):
+    rng = random.Random(0)
+    for i in range(size):
+        garment, material = rng.choice(GARMENTS), rng.choice(MATERIALS)
+        yield {
+            'name': f"{garment} de {material} {rng.choice(COLORS)} {i}",
+            'description': f"{garment} {rng.choice(FITS)} de {material}. Referencia {i}.",
+            'price': round(rng.uniform(5, 200), 2),
+            'category': LOAD_TEST_CATEGORY,
+            'stock': rng.randint(0, 50),
+        }
+
+
+def _time_queries(func, repeat):
+    """Latencia media por búsqueda (ms), sin aprovechar la caché del catálogo"""
+    import database
+
+    results = {}
+    for query in SEARCH_QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            database.get_product_cache().clear()
+            matches = func(query)
+        results[query] = {"ms": (time.perf_counter() - start) / repeat * 1000, "results": len(matches)}
+    return results
+
+
+def _insert_synthetic_catalog(database, size):
+    from sqlalchemy import insert
+
+    rows = list(_synthetic_catalog(size))
+    with database.get_engine().begin() as conn:
+        for offset in range(0, len(rows), 10000):
+            conn.execute(insert(database.Product), rows[offset:offset + 10000])
+
+
+def _delete_synthetic_catalog(database):
+    from sqlalchemy import delete
+
+    with database.get_engine().begin() as conn:
+        conn.execute(delete(database.Product).where(database.Product.category == LOAD_TEST_CATEGORY))
+    database.invalidate_product_cache()
+
+
+def bench_search(args):
+    """search_products (FTS5/tsvector) frente a LIKE y a filtrar el catálogo entero en Python"""
+    with _benchmark_database(args.database_url) as database:
+        engine = database.get_engine()
+
+        def python_scan(query):
+            # Lo único posible sin índice: traer todo el catálogo y buscar en cada producto
+            words = query.lower().split()
+            return [
+                p for p in database.get_products()
+                if all(w in f"{p['name']} {p['description']}".lower() for w in words)
+            ][:20]
+
+        _delete_synthetic_catalog(database)
+        try:
+            start = time.perf_counter()
+            _insert_synthetic_catalog(database, args.catalog_size)
+            load_seconds = time.perf_counter() - start
+            database.invalidate_product_cache()
+            return {
+                "database": engine.dialect.name,
+                "catalog_size": args.catalog_size,
+                # Incluye mantener el índice de búsqueda (triggers en SQLite)
+                "load_seconds": load_seconds,
+                "search_products": _time_queries(lambda q: database.search_products(q, limit=20), 20),
+                "like": _time_queries(lambda q: database.get_products(search=q, limit=20), 5),
+                "python_scan": _time_queries(python_scan, 1),
+            }
+        finally:
+            _delete_synthetic_catalog(database)
+
+
+# Lo que escribe un usuario, pulsación a pulsación, en "@bot ..."
+INLINE_KEYSTROKES = ["c", "ca", "cam", "cami", "camis", "camisa", "camisa l", "camisa li", "camisa lino",
+                     "p", "pa", "pan", "pantalon", "pantalon az", "1", "12", "123", "zapatos"]
+
+
+async def _run_inline(rounds):
+    from telegram import Update
+
+    from app import build_application
+    from fake_telegram import FakeBotRequest, inline_query_update
+
+    application = build_application(token="1:fake", request=FakeBotRequest(), updater=False, persistent=False)
+    latencies = []
+    async with application:
+        update_id = 0
+        for _ in range(rounds):
+            for index, text in enumerate(INLINE_KEYSTROKES):
+                update_id += 1
+                offset = "20" if index % 3 == 2 else ""  # Algunas peticiones piden la página siguiente
+                update = Update.de_json(inline_query_update(update_id, LOAD_TEST_ID_BASE, text, offset), application.bot)
+                start = time.perf_counter()
+                await application.process_update(update)
+                latencies.append(time.perf_counter() - start)
+    return _latency_summary(latencies)
+
+
+def bench_inline(args):
+    """Consultas inline respondidas desde el catálogo en memoria, sin consultas a la base de datos"""
+    with _benchmark_database(args.database_url) as database:
+        _delete_synthetic_catalog(database)
+        try:
+            _insert_synthetic_catalog(database, args.catalog_size)
+            catalog = database.get_catalog_index()
+            start = time.perf_counter()
+            products = database.load_catalog_products()
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            catalog.refresh()
+            refresh_seconds = time.perf_counter() - start
+
+            # Instantánea recién construida: los términos cortos aún no tienen su máscara calculada
+            snapshot = CatalogSnapshot(products)
+            cold, warm = {}, {}
+            for results in (cold, warm):
+                for text in INLINE_KEYSTROKES:
+                    start = time.perf_counter()
+                    snapshot.search(text)
+                    results[text] = (time.perf_counter() - start) * 1000
+            queries_before = metrics.db_queries
+            handler = asyncio.run(_run_inline(args.rounds))
+            return {
+                "catalog_size": len(snapshot),
+                "load_seconds": load_seconds,
+                # Carga desde la base de datos más construcción del índice
+                "refresh_seconds": refresh_seconds,
+                "search_ms_cold": cold,
+                "search_ms_max_cold": max(cold.values()),
+                "search_ms_max_warm": max(warm.values()),
+                "handler": handler,
+                # Las consultas inline no deben tocar la base de datos
+                "db_queries_during_inline": metrics.db_queries - queries_before,
+            }
+        finally:
+            _delete_synthetic_catalog(database)
+
+
+###########################################
+# FOTOS DE PRODUCTOS
+###########################################
+
+def _synthetic_photo(index, size=(2400, 1600)):
+    """JPEG de un tamaño parecido al de una foto de cámara (unos 2,5 MB)"""
+    from PIL import Image
+
+    noise = Image.effect_noise(size, 40 + index % 20)
+    image = Image.merge("RGB", (noise, noise.rotate(90, expand=False), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+async def _send_albums(products, rounds):
+    from app import build_application
+    from fake_telegram import FakeBotRequest
+    from handlers import send_product_photos
+
+    request = FakeBotRequest()
+    application = build_application(token="1:fake", request=request, updater=False, persistent=False)
+    sends = []
+    async with application:
+        for _ in range(rounds):
+            before, start = request.uploaded_bytes, time.perf_counter()
+            await send_product_photos(application.bot, LOAD_TEST_ID_BASE, products)
+            sends.append({
+                "uploaded_bytes": request.uploaded_bytes - before,
+                "seconds": time.perf_counter() - start,
+            })
+    return sends, len(request.calls_to("sendMediaGroup")) + len(request.calls_to("sendPhoto"))
+
+
+def bench_images(args):
+    """Miniaturas generadas en segundo plano y álbumes enviados antes y después de conocer los file_id"""
+    import httpx
+
+    import handlers
+    from images import fetch_image, generate_thumbnails
+
+    with tempfile.TemporaryDirectory() as thumbnail_dir, \
+            _benchmark_database(args.database_url, THUMBNAIL_DIR=thumbnail_dir) as database:
+        handlers.get_thumbnail_store.cache_clear()
+        # Algunas fotos se repiten entre productos (mismo contenido, otra URL)
+        distinct = max(1, args.photos * 2 // 3)
+        photos = [_synthetic_photo(i) for i in range(distinct)]
+        sources = {f"https://images.example/{i}.jpg": photos[i % distinct] for i in range(args.photos)}
+        urls = list(sources)
+
+        def serve(request):
+            return httpx.Response(200, content=sources[str(request.url)], headers={"Content-Type": "image/jpeg"})
+
+        _delete_synthetic_catalog(database)
+        try:
+            rows = list(itertools.islice(_synthetic_catalog(args.photos), args.photos))
+            for row, url in zip(rows, urls):
+                row['image_url'] = url
+            with database.get_engine().begin() as conn:
+                from sqlalchemy import insert
+                conn.execute(insert(database.Product), rows)
+
+            client = httpx.Client(transport=httpx.MockTransport(serve))
+            store = handlers.get_thumbnail_store()
+            start = time.perf_counter()
+            pending = database.get_pending_images(args.photos)
+            results = asyncio.run(generate_thumbnails(
+                pending, store, functools.partial(fetch_image, client), handlers.get_image_executor()
+            ))
+            database.save_product_images(results)
+            pipeline_seconds = time.perf_counter() - start
+            keys = {key for _, _, key in results if key}
+
+            catalog = database.get_catalog_index()
+            catalog.refresh()
+            products = [p for p in catalog.snapshot.products if p['category'] == LOAD_TEST_CATEGORY]
+            sends, api_calls = asyncio.run(_send_albums(products, rounds=2))
+            return {
+                "photos": args.photos,
+                "distinct_thumbnails": len(keys),
+                "pipeline_seconds": pipeline_seconds,
+                "thumbnails_per_second": len(results) / pipeline_seconds,
+                "source_bytes_avg": sum(map(len, sources.values())) // len(sources),
+                "thumbnail_bytes_avg": sum(os.path.getsize(store.path(key)) for key in keys) // max(1, len(keys)),
+                # Sin trabajo pendiente, otra pasada no descarga ni procesa nada
+                "pending_after_pipeline": len(database.get_pending_images(args.photos)),
+                "album_requests_per_send": api_calls // len(sends),
+                "first_send": sends[0],
+                "warm_send": sends[1],
+            }
+        finally:
+            _delete_synthetic_catalog(database)
+
+
+###########################################
+# LOG
+###########################################
+
+class _StallingStream:
+    """Salida que se bloquea `stall` segundos cada `every` escrituras (tubería llena, recolector de log lento)"""
+
+    def __init__(self, output, stall, every=1000):
+        self.output = output
+        self.stall = stall
+        self.every = every
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes % self.every == 0:
+            time.sleep(self.stall)
+        return self.output.write(data)
+
+    def flush(self):
+        self.output.flush()
+
+
+def _log_latencies(logger, number, log):
+    latencies = []
+    for i in range(number):
+        start = time.perf_counter()
+        log(logger, i)
+        latencies.append(time.perf_counter() - start)
+    # Los bloqueos de la salida son pocos pero largos: cuenta el tiempo total bloqueado
+    return {**_latency_summary(latencies), "caller_seconds": sum(latencies)}
+
+
+def _log_registration(logger, i):
+    logger.info("Registro de %s: teléfono recibido", LOAD_TEST_ID_BASE + i, extra={"phone": "+34 612 345 678"})
+
+
+def _log_registration_legacy(logger, i):
+    logger.info(f"Recibido teléfono: +34 612 345 678 ({LOAD_TEST_ID_BASE + i})")
+
+
+def bench_logging(args):
+    """Coste para quien registra: escritura síncrona frente a la cola, y registros por debajo del nivel"""
+    import logs
+    from config import LOG_FORMAT
+
+    logger = logging.getLogger("benchmarks.logging")
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            with open(os.path.join(temp_dir, "sync.log"), "w") as output:
+                handler = logging.StreamHandler(_StallingStream(output, args.log_stall_ms / 1000))
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                root.handlers[:] = [handler]
+                root.setLevel(logging.INFO)
+                results["sync_text"] = _log_latencies(logger, args.number, _log_registration_legacy)
+
+            with open(os.path.join(temp_dir, "queue.log"), "w") as output:
+                queue_handler = logs.setup_logging(stream=_StallingStream(output, args.log_stall_ms / 1000))
+                results["queued_json"] = _log_latencies(logger, args.number, _log_registration)
+                start = time.perf_counter()
+                logs.stop_logging()
+                results["queued_json"]["drain_seconds"] = time.perf_counter() - start
+                results["queued_json"]["dropped"] = queue_handler.dropped
+
+            # Por debajo del nivel configurado el f-string se construye igualmente
+            user = {'telegram_id': LOAD_TEST_ID_BASE, 'name': "Usuario de prueba", 'phone': "+34 612 345 678",
+                    'email': "prueba@example.com", 'address': "Calle Mayor 1, Madrid"}
+            results["suppressed_debug"] = {
+                "fstring": measure(lambda: logger.debug(f"Usuario cargado: {user}"), args.number),
+                "lazy": measure(lambda: logger.debug("Usuario cargado: %s", user), args.number),
+            }
+        finally:
+            logs.stop_logging()
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+    return results
+
+
+SCENARIOS = {
+    "keyboards": lambda args: bench_keyboards(args.number),
+    "router": lambda args: bench_router(args.number),
+    "pipeline": bench_pipeline,
+    "reservations": bench_reservations,
+    "search": bench_search,
+    "inline": bench_inline,
+    "images": bench_images,
+    "logging": bench_logging,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del bot")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"Escenarios a ejecutar: {', '.join(sorted(SCENARIOS))} (por defecto, todos)")
+    parser.add_argument("--number", type=int, default=10000, help="Repeticiones por medición")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios sintéticos del escenario pipeline")
+    parser.add_argument("--concurrency", type=int, default=20, help="Usuarios simultáneos del escenario pipeline")
+    parser.add_argument("--bot-latency", type=float, default=0.0,
+                        help="Latencia simulada de la Bot API en milisegundos")
+    parser.add_argument("--persistent", action="store_true", help="Activa la persistencia en base de datos")
+    parser.add_argument("--concurrent-updates", type=int,
+                        help="Actualizaciones procesadas a la vez (por defecto, CONCURRENT_UPDATES)")
+    parser.add_argument("--burst", action="store_true",
+                        help="Cada usuario envía todas sus actualizaciones sin esperar respuesta")
+    parser.add_argument("--unordered", action="store_true",
+                        help="Procesa en paralelo sin mantener el orden por chat (para comparar)")
+    parser.add_argument("--reservations", type=int, default=5000,
+                        help="Intentos de reserva del escenario reservations (repartidos entre --concurrency hilos)")
+    parser.add_argument("--products", type=int, default=20, help="Productos del escenario reservations")
+    parser.add_argument("--stock", type=int, default=50, help="Stock inicial de cada producto en reservations")
+    parser.add_argument("--catalog-size", type=int, default=100000,
+                        help="Productos sintéticos de los escenarios search e inline")
+    parser.add_argument("--rounds", type=int, default=20, help="Rondas de pulsaciones del escenario inline")
+    parser.add_argument("--photos", type=int, default=30, help="Productos con foto del escenario images")
+    parser.add_argument("--log-stall-ms", type=float, default=20,
+                        help="Bloqueo de la salida del escenario logging cada 1000 registros")
+    parser.add_argument("--database-url",
+                        help="Base de datos de los escenarios con base de datos (por defecto, un SQLite temporal)")
+    parser.add_argument("--output", help="Guarda los resultados en un archivo JSON")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    results = {name: SCENARIOS[name](args) for name in (args.scenarios or sorted(SCENARIOS))}
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+# Telegram admite unos 30 mensajes por segundo en total y 1 por segundo por chat
+DEFAULT_GLOBAL_RATE = 25.0
+DEFAULT_PER_CHAT_INTERVAL = 1.0
+
+
+class TokenBucket:
+    """Limitador de tasa asíncrono: `rate` envíos por segundo con ráfagas de hasta `capacity`"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Detiene todos los envíos durante `seconds` (tras un 429 de Telegram)"""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    async def acquire(self):
+        """Espera hasta que haya un token disponible y lo consume"""
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PerChatLimiter:
+    """Garantiza un intervalo mínimo entre dos envíos al mismo chat"""
+
+    def __init__(self, interval=DEFAULT_PER_CHAT_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._last_sent = {}
+
+    async def wait(self, chat_id):
+        now = self._clock()
+        last = self._last_sent.get(chat_id)
+        if last is not None and now - last < self.interval:
+            await asyncio.sleep(self.interval - (now - last))
+        self._last_sent[chat_id] = self._clock()
+        # Los chats que ya no pueden limitar nada se descartan para no crecer sin fin
+        if len(self._last_sent) > 10000:
+            cutoff = self._clock() - self.interval
+            self._last_sent = {chat: sent for chat, sent in self._last_sent.items() if sent > cutoff}
+
+
+class BroadcastStats:
+    """Contadores de una difusión"""
+
+    def __init__(self, sent=0, failed=0, last_user_id=0):
+        self.sent = sent
+        self.failed = failed
+        self.last_user_id = last_user_id
+        self.retries = 0
+
+
+async def send_with_retry(bot, chat_id, text, bucket, chat_limiter, stats, max_retries=5, **send_options):
+    """Envía un mensaje respetando los límites y reintentando ante 429 y errores de red.
+
+    Devuelve True si se entregó. Los usuarios que bloquearon el bot o cuyos
+    chats ya no existen se cuentan como fallidos sin reintentar.
+    """
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        await chat_limiter.wait(chat_id)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **send_options)
+            return True
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            logger.warning("Límite de Telegram alcanzado, esperando %ss", retry_after)
+            bucket.pause(retry_after)
+        except (Forbidden, BadRequest) as e:
+            logger.info("No se puede enviar al chat %s: %s", chat_id, e)
+            return False
+        except (TimedOut, NetworkError) as e:
+            if attempt == max_retries:
+                break
+            logger.warning("Error de red enviando al chat %s: %s. Reintento en %ss", chat_id, e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+        stats.retries += 1
+    return False
+
+
+async def run_broadcast(bot, text, fetch_recipients, save_checkpoint, start_after=0, stats=None,
+                        chunk_size=200, concurrency=10, global_rate=DEFAULT_GLOBAL_RATE,
+                        per_chat_interval=DEFAULT_PER_CHAT_INTERVAL, max_retries=5, **send_options):
+    """Envía un mensaje a todos los destinatarios recorriéndolos por bloques.
+
+    `fetch_recipients(after_id, limit)` devuelve una lista de pares
+    (id interno, chat_id) ordenada por id, y `save_checkpoint(stats)` guarda
+    el progreso al terminar cada bloque. Si la difusión se interrumpe, se
+    puede reanudar con `start_after=stats.last_user_id`; como mucho se
+    repiten los envíos del bloque en curso.
+    """
+    stats = stats or BroadcastStats(last_user_id=start_after)
+    bucket = TokenBucket(global_rate)
+    chat_limiter = PerChatLimiter(per_chat_interval)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deliver(chat_id):
+        async with semaphore:
+            return await send_with_retry(bot, chat_id, text, bucket, chat_limiter, stats, max_retries, **send_options)
+
+    after_id = stats.last_user_id
+    while True:
+        recipients = await fetch_recipients(after_id, chunk_size)
+        if not recipients:
+            break
+        results = await asyncio.gather(*(deliver(chat_id) for _, chat_id in recipients))
+        stats.sent += sum(results)
+        stats.failed += len(results) - sum(results)
+        after_id = stats.last_user_id = recipients[-1][0]
+        await save_checkpoint(stats)
+        if len(recipients) < chunk_size:
+            break
+    return stats
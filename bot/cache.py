@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Valor centinela para distinguir "no está en caché" de un valor None cacheado
+MISSING = object()
+
+
+class TTLCache:
+    """Caché LRU acotada con expiración por tiempo (TTL), segura entre hilos.
+
+    Para no guardar un valor leído antes de una invalidación concurrente, quien
+    lee de la base de datos toma `generation()` antes de la consulta y la pasa
+    a `set()`: si la clave se invalidó entretanto, el valor se descarta.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Generación en la que se invalidó cada clave (acotado a maxsize); las
+        # lecturas anteriores a `_floor` ya no se pueden comprobar y se descartan
+        self._generation = 0
+        self._invalidated = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        """Devuelve el valor cacheado o `default` si no existe o ha expirado"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def generation(self):
+        """Marca que se toma antes de leer el valor que luego se pasa a set()"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, generation=None):
+        """Guarda un valor, expulsando la entrada menos usada si se llena.
+
+        Con `generation` no se guarda (y devuelve False) si la clave se
+        invalidó después de tomar esa marca.
+        """
+        with self._lock:
+            if generation is not None and (
+                generation < self._floor or self._invalidated.get(key, -1) > generation
+            ):
+                return False
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def invalidate(self, key):
+        """Elimina una entrada concreta"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                _, dropped = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, dropped)
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def stats(self):
+        """Devuelve los contadores de aciertos y fallos"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
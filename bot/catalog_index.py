@@ -0,0 +1,188 @@
+import bisect
+import functools
+import itertools
+import re
+import threading
+import time
+import unicodedata
+
+_WORD = re.compile(r"\w+")
+
+# Palabras de una búsqueda que se tienen en cuenta
+MAX_QUERY_TERMS = 8
+
+
+@functools.lru_cache(maxsize=65536)
+def _fold(word):
+    decomposed = unicodedata.normalize("NFKD", word)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Palabras en minúsculas y sin acentos ("Pantalón" -> "pantalon")"""
+    if not text:
+        return []
+    # El catálogo repite mucho las mismas palabras: cada una se normaliza una vez
+    return [word if word.isascii() else _fold(word) for word in _WORD.findall(text.lower())]
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _positions_to_mask(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _iter_bits(mask):
+    """Posiciones de los bits activos de una máscara, de menor a mayor"""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield (index << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+class CatalogSnapshot:
+    """Instantánea inmutable del catálogo indexada por las palabras de cada producto.
+
+    Los productos se numeran en el orden recibido (por id) y, para cada
+    palabra, el conjunto de productos que la contienen se guarda como máscara
+    de bits en un int de Python (o como tupla de posiciones si son pocos), así
+    que unir los resultados de un prefijo e intersecar los de varias palabras
+    son operaciones sobre enteros. Las palabras se buscan por prefijo en una
+    lista ordenada y, si ninguna empieza por el término, como subcadena
+    mediante un índice de trigramas.
+    """
+
+    def __init__(self, products=()):
+        self.products = tuple(products)
+        size = len(self.products)
+        name_index, any_index = {}, {}
+        for position, product in enumerate(self.products):
+            name_tokens = set(tokenize(product['name']))
+            for token in name_tokens:
+                name_index.setdefault(token, []).append(position)
+            for token in name_tokens.union(tokenize(product.get('description'))):
+                any_index.setdefault(token, []).append(position)
+
+        # Con muchas posiciones la máscara ocupa menos que la tupla
+        def encode(positions):
+            if len(positions) * 256 >= size:
+                return _positions_to_mask(positions, size)
+            return tuple(positions)
+
+        self._name = {token: encode(positions) for token, positions in name_index.items()}
+        self._any = {token: encode(positions) for token, positions in any_index.items()}
+        self._tokens = sorted(any_index)
+        self._trigrams = {}
+        for token in self._tokens:
+            for trigram in _trigrams(token):
+                self._trigrams.setdefault(trigram, []).append(token)
+        # Los términos de una o dos letras abarcan muchas palabras: sus máscaras
+        # se guardan (las de una letra, ya al construir la instantánea, fuera
+        # del bucle de eventos; las de dos, en su primera búsqueda)
+        self._short_terms = {}
+        for first, tokens in itertools.groupby(self._tokens, key=lambda token: token[0]):
+            tokens = list(tokens)
+            self._short_terms[first] = self._mask(self._name, tokens), self._mask(self._any, tokens)
+
+    def __len__(self):
+        return len(self.products)
+
+    def _matching_tokens(self, term):
+        start = bisect.bisect_left(self._tokens, term)
+        end = bisect.bisect_left(self._tokens, term + "\U0010ffff", start)
+        if start < end or len(term) < 3:
+            return self._tokens[start:end]
+        candidates = None
+        for trigram in _trigrams(term):
+            tokens = self._trigrams.get(trigram, ())
+            candidates = set(tokens) if candidates is None else candidates.intersection(tokens)
+            if not candidates:
+                return []
+        return [token for token in candidates if term in token]
+
+    def _mask(self, index, tokens):
+        mask = 0
+        sparse = []
+        for token in tokens:
+            postings = index.get(token)
+            if isinstance(postings, int):
+                mask |= postings
+            elif postings:
+                sparse.extend(postings)
+        if sparse:
+            mask |= _positions_to_mask(sparse, len(self.products))
+        return mask
+
+    def _term_masks(self, term):
+        """Productos con una palabra que empieza por (o contiene) el término: en el nombre y en total"""
+        masks = self._short_terms.get(term) if len(term) <= 2 else None
+        if masks is None:
+            tokens = self._matching_tokens(term)
+            masks = self._mask(self._name, tokens), self._mask(self._any, tokens)
+            if len(term) <= 2:
+                self._short_terms[term] = masks
+        return masks
+
+    def search(self, query, offset=0, limit=20):
+        """Devuelve (productos, hay_más) para una página de resultados.
+
+        Todas las palabras deben aparecer en el nombre o la descripción; van
+        primero los productos que las tienen todas en el nombre y, dentro de
+        cada grupo, por id. Sin palabras se recorre el catálogo entero.
+        """
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return list(self.products[offset:offset + limit]), offset + limit < len(self.products)
+
+        in_name = in_any = -1
+        for term in terms:
+            name_mask, any_mask = self._term_masks(term)
+            in_name &= name_mask
+            in_any &= any_mask
+            if not in_any:
+                return [], False
+        positions = itertools.chain(_iter_bits(in_name), _iter_bits(in_any & ~in_name))
+        page = list(itertools.islice(positions, offset, offset + limit + 1))
+        return [self.products[p] for p in page[:limit]], len(page) > limit
+
+
+class CatalogIndex:
+    """Catálogo en memoria para búsquedas frecuentes (consultas inline) sin consultar la base de datos.
+
+    `load_products()` devuelve los productos ordenados por id. `refresh()`
+    construye una instantánea nueva y la sustituye entera: las búsquedas en
+    curso siguen usando la anterior y no necesitan bloqueo. Hasta la primera
+    carga el catálogo está vacío.
+    """
+
+    def __init__(self, load_products, clock=time.monotonic):
+        self._load_products = load_products
+        self._clock = clock
+        self._snapshot = CatalogSnapshot()
+        self._loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh(self):
+        """Recarga el catálogo desde la base de datos (llamar fuera del bucle de eventos)"""
+        with self._refresh_lock:
+            self._snapshot = CatalogSnapshot(self._load_products())
+            self._loaded_at = self._clock()
+        return self._snapshot
+
+    def search(self, query, offset=0, limit=20):
+        return self._snapshot.search(query, offset, limit)
@@ -0,0 +1,186 @@
+import datetime
+import logging
+import os
+
+from slots import DEFAULT_OPENING_HOURS
+
+logger = logging.getLogger(__name__)
+
+# .env.local está en la raíz del proyecto, junto al servidor web
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOTENV_PATH = os.path.join(PROJECT_ROOT, '.env.local')
+
+# URL base de las WebApps (túnel de ngrok hacia el servidor web)
+BASE_URL = "https://78ca-185-107-56-137.ngrok-free.app"
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def _parse_ids(value):
+    return [int(part) for part in value.replace(" ", "").split(",") if part]
+
+
+def _parse_bool(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_rates(value):
+    """Convierte "handlers=0.1,httpx=20" en {"handlers": 0.1, "httpx": 20.0}"""
+    rates = {}
+    for part in value.replace(" ", "").split(","):
+        if part:
+            name, _, rate = part.partition("=")
+            rates[name] = float(rate)
+    return rates
+
+
+class Settings:
+    """Configuración del bot leída de las variables de entorno"""
+
+    def __init__(self, environ=None):
+        env = os.environ if environ is None else environ
+
+        # Token de Telegram
+        self.telegram_token = env.get("TELEGRAM_TOKEN")
+
+        # Administradores fijos (además de los marcados en la base de datos), separados por comas
+        self.admin_user_ids = _parse_ids(env.get("ADMIN_USER_IDS", "1870169979,5338637494"))
+        self.super_admin_user_ids = _parse_ids(env.get("SUPER_ADMIN_USER_IDS", "1870169979"))
+        self.role_refresh_interval = float(env.get("ROLE_REFRESH_INTERVAL", "300"))
+
+        # URLs de las WebApps
+        self.base_url = BASE_URL
+        self.catalog_webapp_url = f"{BASE_URL}/catalog"
+        self.appointments_webapp_url = f"{BASE_URL}/appointments"
+        self.admin_webapp_url = f"{BASE_URL}/admin"
+
+        # Base de datos y pool de conexiones (lo crea db_engine)
+        self.database_url = env.get("DATABASE_URL", "sqlite:///store_bot.db")
+        self.db_max_workers = int(env.get("DB_MAX_WORKERS", "8"))
+        self.db_pool_size = int(env.get("DB_POOL_SIZE", "10"))
+        self.db_max_overflow = int(env.get("DB_MAX_OVERFLOW", "10"))
+        self.db_pool_timeout = int(env.get("DB_POOL_TIMEOUT", "30"))
+        self.db_pool_recycle = int(env.get("DB_POOL_RECYCLE", "1800"))
+        self.db_pool_pre_ping = _parse_bool(env.get("DB_POOL_PRE_PING", "true"))
+        # PostgreSQL en Railway necesita SSL; 0 en DB_STATEMENT_TIMEOUT_MS lo desactiva
+        self.db_sslmode = env.get("DB_SSLMODE", "require")
+        self.db_statement_timeout_ms = int(env.get("DB_STATEMENT_TIMEOUT_MS", "15000"))
+        self.sqlite_busy_timeout_ms = int(env.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.sqlite_cache_kb = int(env.get("SQLITE_CACHE_KB", "20000"))
+
+        # Cachés
+        self.user_cache_size = int(env.get("USER_CACHE_SIZE", "10000"))
+        self.user_cache_ttl = float(env.get("USER_CACHE_TTL", "300"))
+        self.product_cache_size = int(env.get("PRODUCT_CACHE_SIZE", "512"))
+        self.product_cache_ttl = float(env.get("PRODUCT_CACHE_TTL", "60"))
+
+        # Agenda de citas
+        self.appointment_opening_hours = env.get("APPOINTMENT_OPENING_HOURS", DEFAULT_OPENING_HOURS)
+        self.appointment_slot_minutes = int(env.get("APPOINTMENT_SLOT_MINUTES", "30"))
+        self.appointment_slot_capacity = int(env.get("APPOINTMENT_SLOT_CAPACITY", "1"))
+        self.appointment_slot_cache_ttl = float(env.get("APPOINTMENT_SLOT_CACHE_TTL", "30"))
+
+        # Trabajos periódicos y difusiones
+        self.reminder_interval = float(env.get("REMINDER_INTERVAL", "60"))
+        self.reminder_lead = datetime.timedelta(hours=float(env.get("REMINDER_LEAD_HOURS", "24")))
+        self.reminder_batch_size = int(env.get("REMINDER_BATCH_SIZE", "100"))
+        self.broadcast_rate = float(env.get("BROADCAST_RATE", "25"))
+
+        # Consultas inline (@bot camisa): catálogo en memoria recargado cada CATALOG_SNAPSHOT_INTERVAL segundos
+        self.catalog_snapshot_interval = float(env.get("CATALOG_SNAPSHOT_INTERVAL", "60"))
+        self.inline_cache_time = int(env.get("INLINE_CACHE_TIME", "30"))
+
+        # Miniaturas de las fotos de productos (se generan en segundo plano y se suben a Telegram una vez)
+        self.thumbnail_dir = env.get("THUMBNAIL_DIR", os.path.join(PROJECT_ROOT, "data", "thumbnails"))
+        self.thumbnail_max_size = int(env.get("THUMBNAIL_MAX_SIZE", "1280"))
+        self.image_workers = int(env.get("IMAGE_WORKERS", "2"))
+        self.image_pipeline_interval = float(env.get("IMAGE_PIPELINE_INTERVAL", "300"))
+        self.image_batch_size = int(env.get("IMAGE_BATCH_SIZE", "50"))
+        # Las imágenes que no se pudieron descargar se reintentan con espera exponencial (segundos)
+        self.image_retry_base = float(env.get("IMAGE_RETRY_BASE", "300"))
+        self.image_retry_max = float(env.get("IMAGE_RETRY_MAX", "86400"))
+
+        # Reservas de stock: duración y liberación periódica de las caducadas
+        self.reservation_hold = datetime.timedelta(minutes=float(env.get("RESERVATION_HOLD_MINUTES", "15")))
+        self.reservation_release_interval = float(env.get("RESERVATION_RELEASE_INTERVAL", "60"))
+        self.reservation_release_batch_size = int(env.get("RESERVATION_RELEASE_BATCH_SIZE", "500"))
+        # Unidades reservadas a la vez por usuario: de cada producto y en total
+        self.reservation_max_per_product = int(env.get("RESERVATION_MAX_PER_PRODUCT", "5"))
+        self.reservation_max_per_user = int(env.get("RESERVATION_MAX_PER_USER", "20"))
+
+        # Latencia, errores y consultas por manejador; 0 en METRICS_LOG_INTERVAL desactiva el resumen periódico
+        self.metrics_enabled = _parse_bool(env.get("METRICS_ENABLED", "true"))
+        self.metrics_log_interval = float(env.get("METRICS_LOG_INTERVAL", "300"))
+
+        # Modo de ejecución: "polling" (por defecto) o "webhook"
+        self.bot_mode = env.get("BOT_MODE", "polling")
+        self.webhook_url = env.get("WEBHOOK_URL")
+        self.webhook_path = env.get("WEBHOOK_PATH", "/telegram")
+        self.webhook_secret = env.get("WEBHOOK_SECRET")
+        self.webhook_listen = env.get("WEBHOOK_LISTEN", "0.0.0.0")
+        self.webhook_port = int(env.get("PORT", "8443"))
+
+        # Actualizaciones procesadas a la vez (de chats distintos; las de un chat van en orden). 1 = una a una
+        self.concurrent_updates = int(env.get("CONCURRENT_UPDATES", "16"))
+
+        # Conexiones a la Bot API: las llamadas independientes de una respuesta se envían a la vez.
+        # BOT_HTTP_VERSION "auto" usa HTTP/2 si está instalado h2 (python-telegram-bot[http2])
+        self.bot_connection_pool_size = int(env.get("BOT_CONNECTION_POOL_SIZE", "64"))
+        self.bot_pool_timeout = float(env.get("BOT_POOL_TIMEOUT", "5"))
+        self.bot_http_version = env.get("BOT_HTTP_VERSION", "auto")
+
+        # Cada cuántos segundos se guardan las conversaciones y user_data en la base de datos
+        self.persistence_update_interval = float(env.get("PERSISTENCE_UPDATE_INTERVAL", "5"))
+
+        # Log: "json" (una línea por registro) o "text"; lo escribe un hilo aparte desde una cola
+        self.log_level = env.get("LOG_LEVEL", "INFO").upper()
+        self.log_format = env.get("LOG_FORMAT", "json")
+        self.log_queue_size = int(env.get("LOG_QUEUE_SIZE", "10000"))
+        # Por logger (y sus hijos), por debajo de WARNING: fracción de registros que se
+        # conservan y máximo de registros por segundo. httpx registra cada llamada a la Bot API
+        self.log_sample_rates = _parse_rates(env.get("LOG_SAMPLE_RATES", ""))
+        self.log_rate_limits = _parse_rates(env.get("LOG_RATE_LIMITS", "httpx=20"))
+
+
+_settings = None
+
+
+def load_env(path=DOTENV_PATH):
+    """Carga .env.local sin sobrescribir las variables ya definidas en el entorno"""
+    if not os.path.exists(path):
+        logger.warning("¡ADVERTENCIA! .env.local NO existe en %s", path)
+        return False
+    from dotenv import load_dotenv
+
+    load_dotenv(path)
+    return True
+
+
+def get_settings():
+    """Configuración del proceso; se lee (junto con .env.local) en la primera llamada"""
+    global _settings
+    if _settings is None:
+        load_env()
+        _settings = Settings()
+    return _settings
+
+
+def configure(settings):
+    """Sustituye la configuración del proceso (pruebas, benchmarks); llamar antes de usar la base de datos"""
+    global _settings
+    _settings = settings
+
+
+def configure_logging(level=None):
+    """Configura el log de los puntos de entrada (bot, scripts); importar un módulo no lo toca"""
+    from logs import setup_logging
+
+    settings = get_settings()
+    return setup_logging(
+        level=level or settings.log_level,
+        json_output=settings.log_format == "json",
+        text_format=LOG_FORMAT,
+        sample_rates=settings.log_sample_rates,
+        rate_limits=settings.log_rate_limits,
+        queue_size=settings.log_queue_size,
+    )
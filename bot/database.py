@@ -0,0 +1,1370 @@
+import asyncio
+import contextvars
+import datetime
+import functools
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import (
+    and_, bindparam, delete, inspect, func, or_, select, update, Column, Integer, String, DateTime, Boolean, ForeignKey, Float,
+    Text, Index, Table, MetaData, text
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, scoped_session
+
+from cache import TTLCache, MISSING
+from catalog_index import CatalogIndex
+from config import get_settings
+from db_engine import create_db_engine, get_pool_stats
+from metrics import metrics
+from roles import RoleService
+from slots import Schedule, SlotIndex
+
+logger = logging.getLogger(__name__)
+
+###########################################
+# MODELOS DE BASE DE DATOS
+###########################################
+
+Base = declarative_base()
+
+class User(Base):
+    """Modelo para almacenar información de los usuarios"""
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, unique=True, nullable=False)
+    name = Column(String(100), nullable=False)
+    phone = Column(String(20), nullable=False)
+    email = Column(String(100), nullable=False)
+    address = Column(String(200), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    is_admin = Column(Boolean, default=False)
+    is_super_admin = Column(Boolean, default=False)
+    
+    # Relaciones
+    appointments = relationship("Appointment", back_populates="user")
+
+class Product(Base):
+    """Modelo para almacenar productos"""
+    __tablename__ = "products"
+    __table_args__ = (
+        # Filtro por categoría paginado por id (get_products)
+        Index("ix_products_category_id", "category", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    description = Column(Text)
+    price = Column(Float, nullable=False)
+    image_url = Column(String(200))
+    category = Column(String(50))
+    stock = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class Appointment(Base):
+    """Modelo para almacenar citas"""
+    __tablename__ = "appointments"
+    __table_args__ = (
+        # Citas de un usuario ordenadas por fecha (get_user_appointments)
+        Index("ix_appointments_user_id_date", "user_id", "date"),
+        # Citas por estado en un rango de fechas (agenda, recordatorios)
+        Index("ix_appointments_status_date", "status", "date"),
+        # Cola de recordatorios pendientes ordenada por fecha
+        Index("ix_appointments_reminder_due", "reminder_sent_at", "date"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    date = Column(DateTime, nullable=False)
+    status = Column(String(20), default="pending")  # pending, confirmed, cancelled
+    notes = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    reminder_sent_at = Column(DateTime)
+    
+    # Relaciones
+    user = relationship("User", back_populates="appointments")
+
+class Broadcast(Base):
+    """Modelo para las difusiones a todos los usuarios y su progreso"""
+    __tablename__ = "broadcasts"
+    
+    id = Column(Integer, primary_key=True)
+    text = Column(Text, nullable=False)
+    status = Column(String(20), default="running")  # running, done
+    last_user_id = Column(Integer, default=0)  # Último users.id procesado
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    created_by = Column(Integer)  # telegram_id del administrador
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class StockReservation(Base):
+    """Unidades de un producto apartadas para un usuario hasta que compra o caduca la reserva"""
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        # Carrito de un usuario (checkout) y reservas caducadas (liberación en bloque)
+        Index("ix_stock_reservations_telegram_id", "telegram_id"),
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class Order(Base):
+    """Modelo para los pedidos confirmados desde el bot"""
+    __tablename__ = "orders"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    total = Column(Float, nullable=False)
+    status = Column(String(20), default="confirmed")  # confirmed, cancelled
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    # Relaciones
+    items = relationship("OrderItem", back_populates="order")
+
+class OrderItem(Base):
+    """Línea de un pedido con el precio unitario en el momento de la compra"""
+    __tablename__ = "order_items"
+    
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+    
+    # Relaciones
+    order = relationship("Order", back_populates="items")
+
+class ProductImage(Base):
+    """Miniatura generada de la imagen de un producto y su file_id en Telegram"""
+    __tablename__ = "product_images"
+    __table_args__ = (
+        # Una miniatura compartida por varios productos se sube una sola vez
+        Index("ix_product_images_thumbnail_key", "thumbnail_key"),
+    )
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    source_url = Column(String(500), nullable=False)  # image_url del que se generó
+    thumbnail_key = Column(String(64))  # Clave en ThumbnailStore; None si la imagen no se pudo procesar
+    file_id = Column(String(200))  # file_id de Telegram tras la primera subida
+    failures = Column(Integer, default=0)  # Intentos fallidos seguidos con este source_url
+    retry_at = Column(DateTime)  # Cuándo volver a intentarlo si falló (UTC)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Tablas para las consultas de Core (sin crear objetos del ORM)
+products_table = Product.__table__
+stock_reservations = StockReservation.__table__
+product_images = ProductImage.__table__
+
+###########################################
+# ADMINISTRACIÓN DE BASE DE DATOS
+###########################################
+
+# Importar el módulo no conecta ni crea nada: el motor, las cachés y el resto
+# de componentes se crean en su primer uso a partir de la configuración.
+_engine = None
+_engine_lock = threading.Lock()
+Session = scoped_session(sessionmaker())
+
+def get_engine():
+    """Devuelve el motor de base de datos, creándolo en la primera llamada"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                settings = get_settings()
+                engine = create_db_engine(settings.database_url, settings)
+                metrics.watch_engine(engine)
+                Session.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def dispose_engine():
+    """Cierra el motor; el siguiente get_engine() crea uno nuevo con la configuración vigente"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            Session.remove()
+            _engine.dispose()
+            _engine = None
+
+@functools.cache
+def get_user_cache():
+    """Caché de usuarios por telegram_id (también cachea los usuarios inexistentes)"""
+    settings = get_settings()
+    return TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+@functools.cache
+def get_product_cache():
+    """Caché de consultas del catálogo.
+    
+    Las claves incluyen la versión del catálogo, que se incrementa con cada
+    escritura para invalidar los resultados anteriores.
+    """
+    settings = get_settings()
+    return TTLCache(maxsize=settings.product_cache_size, ttl=settings.product_cache_ttl)
+
+catalog_version = 0
+
+def init_db(force=False):
+    """Inicializa la base de datos creando las tablas y aplicando migraciones.
+    
+    Si el esquema ya está en la última versión no se comprueba tabla por
+    tabla: cada arranque hace una sola consulta. `force` obliga a revisarlo.
+    """
+    engine = get_engine()
+    if not force and schema_is_current(engine):
+        logger.debug("Esquema de base de datos al día")
+        return
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+###########################################
+# MIGRACIONES DE ESQUEMA
+###########################################
+
+# create_all solo crea tablas nuevas: los cambios sobre tablas existentes
+# (columnas, índices) se aplican con migraciones numeradas e idempotentes.
+migrations_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", migrations_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, default=datetime.datetime.utcnow)
+)
+
+def _add_column_if_missing(conn, model, column_name):
+    """Añade a una tabla existente una columna definida en el modelo"""
+    table = model.__table__
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, bool):
+        ddl += f" DEFAULT {'TRUE' if default else 'FALSE'}"
+    elif isinstance(default, (int, float)):
+        ddl += f" DEFAULT {default}"
+    elif isinstance(default, str):
+        ddl += f" DEFAULT '{default}'"
+    conn.exec_driver_sql(ddl)
+
+def _create_index(conn, model, index_name):
+    """Crea un índice definido en el modelo si aún no existe"""
+    index = next(i for i in model.__table__.indexes if i.name == index_name)
+    index.create(conn, checkfirst=True)
+
+def _migration_1(conn):
+    # Bases de datos creadas por el servidor web no tienen esta columna
+    _add_column_if_missing(conn, User, "is_super_admin")
+
+def _migration_2(conn):
+    _create_index(conn, Product, "ix_products_category_id")
+    _create_index(conn, Appointment, "ix_appointments_user_id_date")
+    _create_index(conn, Appointment, "ix_appointments_status_date")
+
+def _migration_3(conn):
+    _add_column_if_missing(conn, Appointment, "reminder_sent_at")
+    _create_index(conn, Appointment, "ix_appointments_reminder_due")
+
+def _migration_4(conn):
+    for model in (StockReservation, Order, OrderItem):
+        model.__table__.create(conn, checkfirst=True)
+
+# Índice de búsqueda de productos. En SQLite, una tabla FTS5 que replica
+# name/description mediante triggers (también para lo que escriba el servidor
+# web); en PostgreSQL, una columna tsvector generada con raíces en español y
+# sin acentos, con índice GIN.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    # Solo los cambios de texto: las reservas actualizan el stock continuamente
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$""",
+    """ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('es_unaccent', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('es_unaccent', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+]
+
+def _migration_5(conn):
+    statements = {"sqlite": SQLITE_SEARCH_DDL, "postgresql": POSTGRES_SEARCH_DDL}.get(conn.dialect.name)
+    if statements is None:
+        logger.warning("Sin índice de búsqueda para %s: search_products usará LIKE", conn.dialect.name)
+        return
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+def _migration_6(conn):
+    ProductImage.__table__.create(conn, checkfirst=True)
+
+def _migration_7(conn):
+    _add_column_if_missing(conn, ProductImage, "failures")
+    _add_column_if_missing(conn, ProductImage, "retry_at")
+
+# Las tablas nuevas también necesitan una migración (aunque sea vacía): con el
+# esquema al día, init_db ya no ejecuta create_all.
+MIGRATIONS = [
+    (1, "Añadir users.is_super_admin", _migration_1),
+    (2, "Índices de citas y productos", _migration_2),
+    (3, "Recordatorios de citas", _migration_3),
+    (4, "Reservas de stock y pedidos", _migration_4),
+    (5, "Índice de búsqueda de productos", _migration_5),
+    (6, "Miniaturas de productos", _migration_6),
+    (7, "Reintentos de miniaturas fallidas", _migration_7),
+]
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Devuelve la última versión de esquema aplicada (0 si no hay ninguna)"""
+    migrations_metadata.create_all(conn)
+    versions = conn.execute(schema_migrations.select()).all()
+    return max((row.version for row in versions), default=0)
+
+def schema_is_current(engine):
+    """Indica, con una única consulta, si ya se aplicaron todas las migraciones"""
+    try:
+        with engine.connect() as conn:
+            current = conn.execute(select(func.max(schema_migrations.c.version))).scalar()
+    except SQLAlchemyError:
+        # Base de datos nueva: aún no existe schema_migrations
+        return False
+    return current is not None and current >= LATEST_SCHEMA_VERSION
+
+def run_migrations(engine):
+    """Aplica en orden las migraciones pendientes, cada una en su transacción"""
+    with engine.begin() as conn:
+        current = get_schema_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Aplicando migración %s: %s", version, description)
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.datetime.utcnow()
+            ))
+
+def get_session():
+    """Obtiene una sesión de la base de datos"""
+    get_engine()
+    return Session()
+
+# Funciones para gestión de roles
+def load_role_ids():
+    """Devuelve los telegram_id de administradores y superadministradores de la base de datos"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(User.telegram_id, User.is_admin, User.is_super_admin)
+            .filter(or_(User.is_admin.is_(True), User.is_super_admin.is_(True)))
+        )
+        admins, super_admins = set(), set()
+        for row in rows:
+            if row.is_admin:
+                admins.add(row.telegram_id)
+            if row.is_super_admin:
+                super_admins.add(row.telegram_id)
+        return admins, super_admins
+    finally:
+        session.close()
+
+@functools.cache
+def get_roles():
+    """Roles de administración en memoria (RoleService)"""
+    settings = get_settings()
+    return RoleService(
+        load_role_ids,
+        static_admins=settings.admin_user_ids,
+        static_super_admins=settings.super_admin_user_ids
+    )
+
+def is_admin(user_id):
+    """Verifica si un usuario es administrador (sin consultar la base de datos)"""
+    return get_roles().is_admin(user_id)
+
+def is_super_admin(user_id):
+    """Verifica si un usuario es superadministrador (sin consultar la base de datos)"""
+    return get_roles().is_super_admin(user_id)
+
+def set_user_roles(telegram_id, **roles):
+    """Cambia is_admin/is_super_admin de un usuario y recarga los roles en memoria"""
+    updated = update_user(telegram_id, **roles)
+    if updated:
+        get_roles().refresh()
+    return updated
+
+# Funciones para gestión de usuarios
+def save_user(telegram_id, name, phone, email, address):
+    """Guarda un nuevo usuario en la base de datos"""
+    session = get_session()
+    try:
+        user = User(
+            telegram_id=telegram_id,
+            name=name,
+            phone=phone,
+            email=email,
+            address=address
+        )
+        session.add(user)
+        session.commit()
+        get_user_cache().invalidate(telegram_id)
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error("Error al guardar usuario: %s", e)
+        return False
+    finally:
+        session.close()
+
+def user_exists(telegram_id):
+    """Verifica si un usuario existe en la base de datos"""
+    return get_user(telegram_id) is not None
+
+def get_user(telegram_id):
+    """Obtiene información de un usuario por su ID de Telegram"""
+    user_cache = get_user_cache()
+    cached = user_cache.get(telegram_id)
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+    
+    # Si save_user/update_user invalidan la clave durante la consulta, lo
+    # leído puede estar ya desfasado y no se guarda en caché
+    generation = user_cache.generation()
+    session = get_session()
+    try:
+        user = session.query(User).filter_by(telegram_id=telegram_id).first()
+        user_data = None
+        if user:
+            user_data = {
+                'id': user.id,
+                'name': user.name,
+                'phone': user.phone,
+                'email': user.email,
+                'address': user.address,
+                'is_admin': user.is_admin,
+                'is_super_admin': user.is_super_admin
+            }
+        user_cache.set(telegram_id, user_data, generation)
+        return dict(user_data) if user_data else None
+    finally:
+        session.close()
+
+def get_db_pool_stats():
+    """Devuelve el estado del pool de conexiones y los tiempos de espera"""
+    return get_pool_stats(get_engine())
+
+def get_user_cache_stats():
+    """Devuelve los contadores de aciertos/fallos de la caché de usuarios"""
+    return get_user_cache().stats()
+
+def update_user(telegram_id, **kwargs):
+    """Actualiza la información de un usuario"""
+    session = get_session()
+    try:
+        user = session.query(User).filter_by(telegram_id=telegram_id).first()
+        if user:
+            for key, value in kwargs.items():
+                if hasattr(user, key):
+                    setattr(user, key, value)
+            session.commit()
+            get_user_cache().invalidate(telegram_id)
+            if 'telegram_id' in kwargs:
+                get_user_cache().invalidate(kwargs['telegram_id'])
+            return True
+        return False
+    except Exception as e:
+        session.rollback()
+        logger.error("Error al actualizar usuario: %s", e)
+        return False
+    finally:
+        session.close()
+
+# Funciones para gestión de productos
+def add_product(name, description, price, image_url=None, category=None, stock=0):
+    """Añade un nuevo producto"""
+    session = get_session()
+    try:
+        product = Product(
+            name=name,
+            description=description,
+            price=price,
+            image_url=image_url,
+            category=category,
+            stock=stock
+        )
+        session.add(product)
+        session.commit()
+        invalidate_product_cache()
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error("Error al añadir producto: %s", e)
+        return False
+    finally:
+        session.close()
+
+def invalidate_product_cache():
+    """Invalida los resultados cacheados del catálogo"""
+    global catalog_version
+    catalog_version += 1
+    get_product_cache().clear()
+
+def get_products(category=None, min_price=None, max_price=None, in_stock=False,
+                 search=None, after_id=None, limit=None):
+    """Obtiene productos filtrados, paginados por id (keyset).
+    
+    Para pedir la página siguiente se pasa `after_id` con el id del último
+    producto recibido. Sin `limit` se devuelven todos los que coincidan.
+    """
+    version = catalog_version
+    cache_key = (version, category, min_price, max_price, in_stock, search, after_id, limit)
+    product_cache = get_product_cache()
+    cached = product_cache.get(cache_key)
+    if cached is not MISSING:
+        return [dict(p) for p in cached]
+    
+    session = get_session()
+    try:
+        query = session.query(Product)
+        if category:
+            query = query.filter(Product.category == category)
+        if min_price is not None:
+            query = query.filter(Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price <= max_price)
+        if in_stock:
+            query = query.filter(Product.stock > 0)
+        if search:
+            query = query.filter(or_(
+                Product.name.icontains(search, autoescape=True),
+                Product.description.icontains(search, autoescape=True)
+            ))
+        if after_id is not None:
+            query = query.filter(Product.id > after_id)
+        query = query.order_by(Product.id)
+        if limit is not None:
+            query = query.limit(limit)
+        products = [
+            {
+                'id': p.id,
+                'name': p.name,
+                'description': p.description,
+                'price': p.price,
+                'image_url': p.image_url,
+                'category': p.category,
+                'stock': p.stock
+            }
+            for p in query
+        ]
+        product_cache.set(cache_key, products)
+        return [dict(p) for p in products]
+    finally:
+        session.close()
+
+# Palabras de una búsqueda que se tienen en cuenta
+SEARCH_MAX_TERMS = 8
+
+def _search_terms(query):
+    """Palabras de una búsqueda, sin signos: el texto del usuario nunca llega como sintaxis"""
+    return re.findall(r"\w+", query.lower())[:SEARCH_MAX_TERMS]
+
+def search_products(query, limit=20):
+    """Busca productos por nombre y descripción, ordenados por relevancia.
+    
+    Todas las palabras deben aparecer (la última también como prefijo, para
+    buscar mientras se escribe); los acentos no cuentan y en el nombre pesan
+    más que en la descripción. Usa el índice de texto completo de SQLite
+    (FTS5) o PostgreSQL (tsvector en español).
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    cache_key = ("search", catalog_version, tuple(terms), limit)
+    product_cache = get_product_cache()
+    cached = product_cache.get(cache_key)
+    if cached is not MISSING:
+        return [dict(p) for p in cached]
+    
+    session = get_session()
+    try:
+        dialect = session.bind.dialect.name
+        columns = "p.id, p.name, p.description, p.price, p.image_url, p.category, p.stock"
+        if dialect == "sqlite":
+            # Frases entre comillas: FTS5 no interpreta operadores del texto del usuario
+            match = " ".join(f'"{term}"' for term in terms) + "*"
+            rows = session.execute(text(
+                f"SELECT {columns} FROM products_fts f JOIN products p ON p.id = f.rowid "
+                "WHERE products_fts MATCH :match "
+                "ORDER BY bm25(products_fts, 10.0, 1.0), p.id LIMIT :limit"
+            ), {'match': match, 'limit': limit})
+        elif dialect == "postgresql":
+            tsquery = " & ".join(terms) + ":*"
+            rows = session.execute(text(
+                f"SELECT {columns} FROM products p, to_tsquery('es_unaccent', :tsquery) q "
+                "WHERE p.search_vector @@ q "
+                "ORDER BY ts_rank_cd(p.search_vector, q) DESC, p.id LIMIT :limit"
+            ), {'tsquery': tsquery, 'limit': limit})
+        else:
+            return get_products(search=query, limit=limit)
+        products = [dict(row._mapping) for row in rows]
+        product_cache.set(cache_key, products)
+        return [dict(p) for p in products]
+    finally:
+        session.close()
+
+def load_catalog_products():
+    """Todos los productos ordenados por id, para la instantánea del catálogo en memoria"""
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            select(
+                products_table.c.id, products_table.c.name, products_table.c.description,
+                products_table.c.price, products_table.c.image_url, products_table.c.category,
+                products_table.c.stock
+            ).order_by(products_table.c.id)
+        )
+        return [dict(row._mapping) for row in rows]
+
+@functools.cache
+def get_catalog_index():
+    """Catálogo en memoria de las consultas inline (CatalogIndex); lo recarga un trabajo periódico"""
+    return CatalogIndex(load_catalog_products)
+
+def get_product_cache_stats():
+    """Devuelve los contadores de aciertos/fallos de la caché del catálogo"""
+    return get_product_cache().stats()
+
+# Funciones para gestión de citas
+
+# Estados que ocupan una franja de la agenda
+ACTIVE_APPOINTMENT_STATUSES = ("pending", "confirmed")
+
+@functools.cache
+def get_schedule():
+    """Horario de apertura y franjas de la agenda"""
+    settings = get_settings()
+    return Schedule.from_string(
+        settings.appointment_opening_hours,
+        slot_minutes=settings.appointment_slot_minutes,
+        capacity=settings.appointment_slot_capacity
+    )
+
+def _load_booked_dates(start, end):
+    """Fechas de las citas activas en [start, end)"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(Appointment.date)
+            .filter(Appointment.date >= start, Appointment.date < end)
+            .filter(Appointment.status.in_(ACTIVE_APPOINTMENT_STATUSES))
+        )
+        return [row.date for row in rows]
+    finally:
+        session.close()
+
+@functools.cache
+def get_slot_index():
+    """Índice en memoria de las franjas ocupadas"""
+    return SlotIndex(get_schedule(), _load_booked_dates, ttl=get_settings().appointment_slot_cache_ttl)
+
+def get_free_slots(start, end):
+    """Devuelve los inicios de franja con hueco entre dos fechas"""
+    return get_slot_index().free_slots(start, end)
+
+def _count_slot_bookings(session, slot_start):
+    """Cuenta las citas activas dentro de una franja"""
+    return (
+        session.query(func.count(Appointment.id))
+        .filter(Appointment.date >= slot_start)
+        .filter(Appointment.date < slot_start + get_schedule().slot_length)
+        .filter(Appointment.status.in_(ACTIVE_APPOINTMENT_STATUSES))
+        .scalar()
+    )
+
+def book_appointment(user_id, date, notes=None):
+    """Reserva una franja de forma atómica y crea la cita.
+    
+    Devuelve el id de la cita, o None si la fecha no es el inicio de una franja
+    del horario o la franja ya está completa.
+    """
+    schedule = get_schedule()
+    if not schedule.is_slot_start(date):
+        return None
+    
+    session = get_session()
+    try:
+        capacity = schedule.capacity
+        if session.bind.dialect.name == "postgresql":
+            # Bloqueo transaccional por franja: las reservas de la misma franja se serializan
+            slot_key = int(date.timestamp()) // 60
+            session.execute(select(func.pg_advisory_xact_lock(slot_key)))
+            if _count_slot_bookings(session, date) >= capacity:
+                session.rollback()
+                return None
+        
+        appointment = Appointment(user_id=user_id, date=date, notes=notes)
+        session.add(appointment)
+        session.flush()
+        
+        # En SQLite la inserción ya tiene el bloqueo de escritura de la base de
+        # datos, así que el recuento posterior no puede cambiar hasta el commit.
+        if _count_slot_bookings(session, date) > capacity:
+            session.rollback()
+            return None
+        
+        session.commit()
+        return appointment.id
+    except Exception as e:
+        session.rollback()
+        logger.error("Error al crear cita: %s", e)
+        return None
+    finally:
+        session.close()
+        get_slot_index().invalidate(date)
+
+def create_appointment(user_id, date, notes=None):
+    """Crea una nueva cita si la franja está disponible"""
+    return book_appointment(user_id, date, notes) is not None
+
+def _filter_appointments(query, start=None, end=None, status=None, upcoming=False):
+    """Aplica a una consulta de citas los filtros de fecha y estado"""
+    if upcoming and start is None:
+        start = datetime.datetime.now()
+    if start is not None:
+        query = query.filter(Appointment.date >= start)
+    if end is not None:
+        query = query.filter(Appointment.date < end)
+    if isinstance(status, str):
+        query = query.filter(Appointment.status == status)
+    elif status is not None:
+        query = query.filter(Appointment.status.in_(list(status)))
+    return query
+
+def get_user_appointments(telegram_id, start=None, end=None, status=None, upcoming=False, limit=None):
+    """Obtiene las citas de un usuario ordenadas por fecha en una sola consulta.
+    
+    `status` puede ser un estado o una lista de estados; `upcoming=True`
+    limita el resultado a las citas a partir de ahora.
+    """
+    session = get_session()
+    try:
+        query = (
+            session.query(Appointment)
+            .join(User, Appointment.user_id == User.id)
+            .filter(User.telegram_id == telegram_id)
+        )
+        query = _filter_appointments(query, start, end, status, upcoming)
+        query = query.order_by(Appointment.date, Appointment.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [
+            {
+                'id': a.id,
+                'date': a.date,
+                'status': a.status,
+                'notes': a.notes
+            }
+            for a in query
+        ]
+    finally:
+        session.close()
+
+# Tamaño máximo de cada lista IN en las consultas por lotes
+BATCH_QUERY_SIZE = 500
+
+def get_appointments_for_users(telegram_ids, start=None, end=None, status=None, upcoming=False,
+                               limit_per_user=None):
+    """Obtiene las citas de varios usuarios a la vez, con los datos del usuario.
+    
+    Devuelve un diccionario {telegram_id: [citas ordenadas por fecha]} e incluye
+    también a los usuarios sin citas. Evita lanzar una consulta por usuario en
+    las vistas de administración y en los trabajos de recordatorio.
+    """
+    telegram_ids = list(dict.fromkeys(telegram_ids))
+    result = {telegram_id: [] for telegram_id in telegram_ids}
+    session = get_session()
+    try:
+        for i in range(0, len(telegram_ids), BATCH_QUERY_SIZE):
+            chunk = telegram_ids[i:i + BATCH_QUERY_SIZE]
+            query = (
+                session.query(
+                    Appointment.id, Appointment.date, Appointment.status, Appointment.notes,
+                    User.telegram_id, User.name
+                )
+                .join(User, Appointment.user_id == User.id)
+                .filter(User.telegram_id.in_(chunk))
+            )
+            query = _filter_appointments(query, start, end, status, upcoming)
+            if limit_per_user is not None:
+                # Numerar las citas de cada usuario para cortar en la propia consulta
+                position = func.row_number().over(
+                    partition_by=User.telegram_id,
+                    order_by=(Appointment.date, Appointment.id)
+                ).label("position")
+                ranked = query.add_columns(position).subquery()
+                query = (
+                    session.query(
+                        ranked.c.id, ranked.c.date, ranked.c.status, ranked.c.notes,
+                        ranked.c.telegram_id, ranked.c.name
+                    )
+                    .filter(ranked.c.position <= limit_per_user)
+                    .order_by(ranked.c.date, ranked.c.id)
+                )
+            else:
+                query = query.order_by(Appointment.date, Appointment.id)
+            for row in query:
+                result[row.telegram_id].append({
+                    'id': row.id,
+                    'date': row.date,
+                    'status': row.status,
+                    'notes': row.notes,
+                    'telegram_id': row.telegram_id,
+                    'user_name': row.name
+                })
+        return result
+    finally:
+        session.close()
+
+# Funciones para recordatorios de citas
+def claim_due_reminders(now, lead, limit=100):
+    """Reclama las citas que necesitan recordatorio en (now, now + lead].
+    
+    Usa una consulta por rango sobre el índice de recordatorios y marca las
+    citas con un UPDATE condicional: si hay varias réplicas del bot, cada cita
+    la reclama solo una de ellas.
+    """
+    session = get_session()
+    try:
+        due_ids = [
+            row.id for row in
+            session.query(Appointment.id)
+            .filter(Appointment.reminder_sent_at.is_(None))
+            .filter(Appointment.date > now, Appointment.date <= now + lead)
+            .filter(Appointment.status.in_(ACTIVE_APPOINTMENT_STATUSES))
+            .order_by(Appointment.date)
+            .limit(limit)
+        ]
+        if not due_ids:
+            return []
+        claimed_ids = session.execute(
+            update(Appointment)
+            .where(Appointment.id.in_(due_ids), Appointment.reminder_sent_at.is_(None))
+            .values(reminder_sent_at=now)
+            .returning(Appointment.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        session.commit()
+        if not claimed_ids:
+            return []
+        rows = (
+            session.query(
+                Appointment.id, Appointment.date, Appointment.created_at, User.telegram_id, User.name
+            )
+            .join(User, Appointment.user_id == User.id)
+            .filter(Appointment.id.in_(claimed_ids))
+            .order_by(Appointment.date)
+        )
+        return [
+            {
+                'id': row.id,
+                'date': row.date,
+                'created_at': row.created_at,
+                'telegram_id': row.telegram_id,
+                'user_name': row.name
+            }
+            for row in rows
+        ]
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def release_reminders(appointment_ids):
+    """Devuelve a la cola las citas cuyo recordatorio no se pudo enviar"""
+    if not appointment_ids:
+        return
+    session = get_session()
+    try:
+        session.query(Appointment).filter(Appointment.id.in_(appointment_ids)).update(
+            {'reminder_sent_at': None}, synchronize_session=False
+        )
+        session.commit()
+    finally:
+        session.close()
+
+# Funciones para difusiones
+def get_user_chunk(after_id, limit):
+    """Devuelve (id, telegram_id) de los siguientes usuarios por id, sin cargar la tabla entera"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(User.id, User.telegram_id)
+            .filter(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [(row.id, row.telegram_id) for row in rows]
+    finally:
+        session.close()
+
+def create_broadcast(text, created_by):
+    """Registra una nueva difusión y devuelve su id"""
+    session = get_session()
+    try:
+        broadcast = Broadcast(text=text, created_by=created_by)
+        session.add(broadcast)
+        session.commit()
+        return broadcast.id
+    finally:
+        session.close()
+
+def save_broadcast_progress(broadcast_id, last_user_id, sent, failed, status="running"):
+    """Guarda el punto de control de una difusión"""
+    session = get_session()
+    try:
+        session.query(Broadcast).filter_by(id=broadcast_id).update({
+            'last_user_id': last_user_id,
+            'sent': sent,
+            'failed': failed,
+            'status': status,
+            'updated_at': datetime.datetime.utcnow()
+        })
+        session.commit()
+    finally:
+        session.close()
+
+def get_unfinished_broadcasts():
+    """Difusiones interrumpidas que hay que reanudar"""
+    session = get_session()
+    try:
+        return [
+            {
+                'id': b.id,
+                'text': b.text,
+                'last_user_id': b.last_user_id or 0,
+                'sent': b.sent or 0,
+                'failed': b.failed or 0
+            }
+            for b in session.query(Broadcast).filter_by(status="running").order_by(Broadcast.id)
+        ]
+    finally:
+        session.close()
+
+# Funciones para reservas de stock y pedidos
+
+# Las reservas descuentan el stock en el momento: Product.stock son siempre las
+# unidades libres. Cada reserva se borra exactamente una vez (DELETE ...
+# RETURNING), al comprarse o al devolver sus unidades, así que una reserva no
+# puede comprarse y liberarse a la vez. El catálogo cacheado puede mostrar un
+# stock desfasado hasta PRODUCT_CACHE_TTL; quien decide es reserve_stock.
+def reserve_stock(telegram_id, product_id, quantity, hold, max_per_product=None, max_per_user=None):
+    """Aparta `quantity` unidades de un producto durante `hold` (timedelta).
+    
+    Descuenta el stock con un único UPDATE condicional (stock >= quantity), así
+    que dos compradores nunca se llevan la misma unidad. Devuelve el id de la
+    reserva, o None si no queda stock suficiente, el producto no existe o el
+    usuario pasaría de `max_per_product` unidades de ese producto o de
+    `max_per_user` en total entre sus reservas vigentes.
+    """
+    if quantity < 1:
+        raise ValueError("La cantidad debe ser un entero positivo")
+    now = datetime.datetime.utcnow()
+    session = get_session()
+    try:
+        reserved = session.execute(
+            update(products_table)
+            .where(products_table.c.id == product_id, products_table.c.stock >= quantity)
+            .values(stock=products_table.c.stock - quantity)
+        ).rowcount
+        if not reserved:
+            session.rollback()
+            return None
+        if max_per_product is not None or max_per_user is not None:
+            # Después del UPDATE: en SQLite la transacción ya tiene el bloqueo de escritura
+            held = dict(session.execute(
+                select(stock_reservations.c.product_id, func.sum(stock_reservations.c.quantity))
+                .where(stock_reservations.c.telegram_id == telegram_id, stock_reservations.c.expires_at > now)
+                .group_by(stock_reservations.c.product_id)
+            ).all())
+            if (
+                (max_per_product is not None and held.get(product_id, 0) + quantity > max_per_product)
+                or (max_per_user is not None and sum(held.values()) + quantity > max_per_user)
+            ):
+                session.rollback()
+                return None
+        reservation_id = session.execute(
+            stock_reservations.insert()
+            .values(
+                telegram_id=telegram_id,
+                product_id=product_id,
+                quantity=quantity,
+                expires_at=now + hold,
+                created_at=now
+            )
+            .returning(stock_reservations.c.id)
+        ).scalar_one()
+        session.commit()
+        invalidate_product_cache()
+        return reservation_id
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _restock(session, rows):
+    """Devuelve al stock las unidades de las reservas borradas (product_id, quantity)"""
+    quantities = {}
+    for product_id, quantity in rows:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if quantities:
+        session.execute(
+            update(products_table)
+            .where(products_table.c.id == bindparam("product"))
+            .values(stock=products_table.c.stock + bindparam("units")),
+            [{'product': product_id, 'units': units} for product_id, units in quantities.items()]
+        )
+    return sum(quantities.values())
+
+def release_expired_reservations(now, limit=500):
+    """Borra hasta `limit` reservas caducadas y devuelve sus unidades al stock.
+    
+    Devuelve el número de reservas liberadas; el trabajo periódico la llama
+    hasta que devuelve menos de `limit`.
+    """
+    session = get_session()
+    try:
+        expired = (
+            select(stock_reservations.c.id)
+            .where(stock_reservations.c.expires_at <= now)
+            .order_by(stock_reservations.c.expires_at)
+            .limit(limit)
+        )
+        rows = session.execute(
+            stock_reservations.delete()
+            .where(stock_reservations.c.id.in_(expired.scalar_subquery()))
+            .returning(stock_reservations.c.product_id, stock_reservations.c.quantity)
+        ).all()
+        _restock(session, rows)
+        session.commit()
+        if rows:
+            invalidate_product_cache()
+        return len(rows)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def cancel_reservations(telegram_id):
+    """Anula todas las reservas de un usuario; devuelve las unidades liberadas"""
+    session = get_session()
+    try:
+        rows = session.execute(
+            stock_reservations.delete()
+            .where(stock_reservations.c.telegram_id == telegram_id)
+            .returning(stock_reservations.c.product_id, stock_reservations.c.quantity)
+        ).all()
+        units = _restock(session, rows)
+        session.commit()
+        if units:
+            invalidate_product_cache()
+        return units
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_cart(telegram_id, now=None):
+    """Reservas vigentes de un usuario agrupadas por producto, con nombre y precio"""
+    now = now or datetime.datetime.utcnow()
+    session = get_session()
+    try:
+        rows = (
+            session.query(
+                Product.id, Product.name, Product.price,
+                func.sum(StockReservation.quantity).label("quantity"),
+                func.min(StockReservation.expires_at).label("expires_at")
+            )
+            .join(StockReservation, StockReservation.product_id == Product.id)
+            .filter(StockReservation.telegram_id == telegram_id, StockReservation.expires_at > now)
+            .group_by(Product.id, Product.name, Product.price)
+            .order_by(Product.id)
+        )
+        return [
+            {
+                'product_id': row.id,
+                'name': row.name,
+                'price': row.price,
+                'quantity': row.quantity,
+                'expires_at': row.expires_at
+            }
+            for row in rows
+        ]
+    finally:
+        session.close()
+
+def checkout(telegram_id, now=None):
+    """Convierte las reservas vigentes de un usuario en un pedido.
+    
+    Las reservas se borran en la misma transacción en la que se crea el pedido:
+    las que ya caducaron no entran. Devuelve un diccionario con el id, el total
+    y las líneas del pedido, o None si el usuario no está registrado o no tiene
+    nada reservado.
+    """
+    now = now or datetime.datetime.utcnow()
+    session = get_session()
+    try:
+        # La transacción empieza escribiendo: en SQLite toma ya el bloqueo de escritura
+        rows = session.execute(
+            stock_reservations.delete()
+            .where(stock_reservations.c.telegram_id == telegram_id, stock_reservations.c.expires_at > now)
+            .returning(stock_reservations.c.product_id, stock_reservations.c.quantity)
+        ).all()
+        user_id = session.query(User.id).filter_by(telegram_id=telegram_id).scalar() if rows else None
+        if user_id is None:
+            session.rollback()
+            return None
+        quantities = {}
+        for product_id, quantity in rows:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        prices = dict(
+            session.query(Product.id, Product.price).filter(Product.id.in_(quantities))
+        )
+        order = Order(
+            user_id=user_id,
+            total=sum(prices[product_id] * quantity for product_id, quantity in quantities.items()),
+            items=[
+                OrderItem(product_id=product_id, quantity=quantity, price=prices[product_id])
+                for product_id, quantity in sorted(quantities.items())
+            ]
+        )
+        session.add(order)
+        session.flush()
+        result = {
+            'id': order.id,
+            'total': order.total,
+            'items': [
+                {'product_id': item.product_id, 'quantity': item.quantity, 'price': item.price}
+                for item in order.items
+            ]
+        }
+        session.commit()
+        return result
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+# Funciones para imágenes de productos
+def get_pending_images(limit=50):
+    """Productos cuya imagen aún no se procesó, cambió desde entonces o toca reintentar: [(id, image_url)]"""
+    session = get_session()
+    try:
+        now = datetime.datetime.utcnow()
+        rows = (
+            session.query(Product.id, Product.image_url)
+            .outerjoin(ProductImage, ProductImage.product_id == Product.id)
+            .filter(Product.image_url.isnot(None), Product.image_url != "")
+            .filter(or_(
+                ProductImage.product_id.is_(None),
+                ProductImage.source_url != Product.image_url,
+                and_(ProductImage.thumbnail_key.is_(None),
+                     or_(ProductImage.retry_at.is_(None), ProductImage.retry_at <= now))
+            ))
+            .order_by(Product.id)
+            .limit(limit)
+        )
+        return [(row.id, row.image_url) for row in rows]
+    finally:
+        session.close()
+
+def save_product_images(results):
+    """Guarda las miniaturas generadas [(product_id, image_url, clave)].
+    
+    Si otra imagen con la misma clave ya se subió a Telegram, se reutiliza su
+    file_id. Las que fallaron se guardan sin clave y se reintentan con espera
+    exponencial (IMAGE_RETRY_BASE, IMAGE_RETRY_MAX) o en cuanto cambie image_url.
+    """
+    if not results:
+        return
+    settings = get_settings()
+    session = get_session()
+    try:
+        keys = {key for _, _, key in results if key}
+        known = dict(
+            session.query(ProductImage.thumbnail_key, ProductImage.file_id)
+            .filter(ProductImage.thumbnail_key.in_(keys), ProductImage.file_id.isnot(None))
+        ) if keys else {}
+        failed = [product_id for product_id, _, key in results if not key]
+        previous = {
+            row.product_id: (row.source_url, row.failures or 0)
+            for row in session.query(ProductImage.product_id, ProductImage.source_url, ProductImage.failures)
+            .filter(ProductImage.product_id.in_(failed), ProductImage.thumbnail_key.is_(None))
+        } if failed else {}
+        now = datetime.datetime.utcnow()
+        for product_id, url, key in results:
+            failures, retry_at = 0, None
+            if not key:
+                source_url, failures = previous.get(product_id, (url, 0))
+                failures = failures + 1 if source_url == url else 1
+                delay = min(settings.image_retry_base * 2 ** min(failures - 1, 30), settings.image_retry_max)
+                retry_at = now + datetime.timedelta(seconds=delay)
+            session.merge(ProductImage(
+                product_id=product_id, source_url=url, thumbnail_key=key, file_id=known.get(key),
+                failures=failures, retry_at=retry_at, updated_at=now
+            ))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_product_images(product_ids):
+    """Miniaturas disponibles de unos productos: {product_id: (clave, file_id o None)}"""
+    if not product_ids:
+        return {}
+    session = get_session()
+    try:
+        rows = (
+            session.query(ProductImage.product_id, ProductImage.thumbnail_key, ProductImage.file_id)
+            .filter(ProductImage.product_id.in_(product_ids), ProductImage.thumbnail_key.isnot(None))
+        )
+        return {row.product_id: (row.thumbnail_key, row.file_id) for row in rows}
+    finally:
+        session.close()
+
+def record_image_file_ids(file_ids):
+    """Guarda los file_id devueltos por Telegram {clave: file_id} en todos los productos con esa miniatura"""
+    if not file_ids:
+        return
+    session = get_session()
+    try:
+        session.execute(
+            update(product_images)
+            .where(product_images.c.thumbnail_key == bindparam("key"))
+            .values(file_id=bindparam("file_id")),
+            [{'key': key, 'file_id': file_id} for key, file_id in file_ids.items()]
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def discard_thumbnails(keys):
+    """Olvida las miniaturas sin file_id cuyo archivo ya no existe; get_pending_images las devuelve de nuevo"""
+    if not keys:
+        return
+    session = get_session()
+    try:
+        session.execute(
+            delete(product_images)
+            .where(product_images.c.thumbnail_key.in_(list(keys)), product_images.c.file_id.is_(None))
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+###########################################
+# ACCESO ASÍNCRONO A BASE DE DATOS
+###########################################
+
+# Las funciones de base de datos son síncronas: se ejecutan en un pool de hilos
+# acotado para no bloquear el bucle de eventos de python-telegram-bot.
+@functools.cache
+def get_db_executor():
+    """Pool de hilos de las funciones de base de datos (DB_MAX_WORKERS hilos)"""
+    return ThreadPoolExecutor(max_workers=get_settings().db_max_workers, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    """Ejecuta una función síncrona de base de datos en el pool de hilos"""
+    loop = asyncio.get_running_loop()
+    # run_in_executor no propaga los contextvars: se copia el contexto para atribuir las consultas al manejador
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+async def user_exists_async(telegram_id):
+    """Versión asíncrona de user_exists"""
+    return await run_db(user_exists, telegram_id)
+
+async def get_user_async(telegram_id):
+    """Versión asíncrona de get_user"""
+    return await run_db(get_user, telegram_id)
+
+async def save_user_async(telegram_id, name, phone, email, address):
+    """Versión asíncrona de save_user"""
+    return await run_db(save_user, telegram_id, name, phone, email, address)
+
+async def update_user_async(telegram_id, **kwargs):
+    """Versión asíncrona de update_user"""
+    return await run_db(update_user, telegram_id, **kwargs)
+
+async def get_products_async(category=None, **filters):
+    """Versión asíncrona de get_products"""
+    return await run_db(get_products, category, **filters)
+
+async def create_appointment_async(user_id, date, notes=None):
+    """Versión asíncrona de create_appointment"""
+    return await run_db(create_appointment, user_id, date, notes)
+
+async def book_appointment_async(user_id, date, notes=None):
+    """Versión asíncrona de book_appointment"""
+    return await run_db(book_appointment, user_id, date, notes)
+
+async def get_free_slots_async(start, end):
+    """Versión asíncrona de get_free_slots"""
+    return await run_db(get_free_slots, start, end)
+
+async def get_user_appointments_async(telegram_id, **filters):
+    """Versión asíncrona de get_user_appointments"""
+    return await run_db(get_user_appointments, telegram_id, **filters)
+
+async def get_appointments_for_users_async(telegram_ids, **filters):
+    """Versión asíncrona de get_appointments_for_users"""
+    return await run_db(get_appointments_for_users, telegram_ids, **filters)
@@ -0,0 +1,131 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from config import get_settings
+
+# Límites (en segundos) del histograma de espera para obtener una conexión del pool
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Tiempo que esperan los hilos para obtener una conexión del pool"""
+
+    def __init__(self, buckets=POOL_WAIT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.bucket_counts = [0] * (len(self.buckets) + 1)
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """Copia de los contadores: número de checkouts, espera total, media, máxima e histograma"""
+        with self._lock:
+            return {
+                'checkouts': self.count,
+                'wait_total': self.total,
+                'wait_avg': self.total / self.count if self.count else 0.0,
+                'wait_max': self.max,
+                'wait_buckets': dict(zip([*map(str, self.buckets), "+Inf"], self.bucket_counts)),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra cuánto tarda cada checkout de conexión"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record(time.perf_counter() - start)
+
+
+def normalize_database_url(url):
+    """Railway proporciona URLs postgres://, pero SQLAlchemy usa postgresql://"""
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def _sqlite_pragmas(busy_timeout_ms, cache_kb):
+    def set_pragmas(dbapi_connection, connection_record):
+        # WAL permite leer mientras otro proceso (el servidor web) escribe
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA cache_size=-{int(cache_kb)}")
+        cursor.close()
+    return set_pragmas
+
+
+def create_db_engine(database_url, settings=None, **options):
+    """Crea el motor de base de datos con el pool configurado en `settings` (por defecto, get_settings()).
+
+    Se usan DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS y DB_SSLMODE (PostgreSQL), y
+    SQLITE_BUSY_TIMEOUT_MS y SQLITE_CACHE_KB (SQLite). `options` se pasa tal
+    cual a create_engine y tiene prioridad.
+    """
+    settings = settings or get_settings()
+    database_url = normalize_database_url(database_url)
+    is_sqlite = database_url.startswith("sqlite")
+    in_memory = is_sqlite and (database_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in database_url)
+
+    engine_options = {}
+    connect_args = {}
+    if not in_memory:
+        engine_options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    if database_url.startswith("postgresql"):
+        # Para PostgreSQL en Railway se necesita SSL
+        connect_args["sslmode"] = settings.db_sslmode
+        if settings.db_statement_timeout_ms:
+            connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+    engine_options["connect_args"] = connect_args
+    engine_options.update(options)
+
+    engine = create_engine(database_url, **engine_options)
+    if is_sqlite and not in_memory:
+        event.listen(engine, "connect", _sqlite_pragmas(settings.sqlite_busy_timeout_ms, settings.sqlite_cache_kb))
+    return engine
+
+
+def get_pool_stats(engine):
+    """Estado del pool de conexiones y métricas de espera en el checkout"""
+    pool = engine.pool
+    stats = pool_metrics.snapshot()
+    stats['pool_status'] = pool.status()
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
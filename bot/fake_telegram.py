@@ -0,0 +1,188 @@
+# Telegram falso para pruebas locales, benchmarks y desarrollo sin red.
+
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+from telegram.request import BaseRequest
+
+from webhook import SECRET_TOKEN_HEADER
+
+FAKE_BOT_USER = {"id": 10000, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+
+def make_user(user_id, username=None):
+    """Usuario de Telegram en formato JSON de la Bot API"""
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": username or f"user{user_id}"}
+
+
+def make_message(message_id, chat_id, text=None, from_user=None):
+    """Mensaje de un chat privado en formato JSON de la Bot API"""
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+    }
+    if from_user is not None:
+        message["from"] = from_user
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return message
+
+
+def message_update(update_id, user_id, text, message_id=None):
+    """Actualización con un mensaje de texto enviado por un usuario"""
+    return {
+        "update_id": update_id,
+        "message": make_message(message_id or update_id, user_id, text, make_user(user_id)),
+    }
+
+
+def callback_update(update_id, user_id, data, message_id=1):
+    """Actualización con la pulsación de un botón inline"""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": make_message(message_id, user_id, "menu", FAKE_BOT_USER),
+        },
+    }
+
+
+def inline_query_update(update_id, user_id, query, offset=""):
+    """Actualización con una consulta inline (@bot texto)"""
+    return {
+        "update_id": update_id,
+        "inline_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "query": query,
+            "offset": offset,
+        },
+    }
+
+
+class FakeBotRequest(BaseRequest):
+    """Implementación en memoria de la Bot API.
+
+    Registra cada llamada en `calls` como (método, parámetros) y en
+    `uploaded_bytes` el tamaño de los archivos subidos. `latency`
+    simula el tiempo de red de cada petición y `error_hook(method, params)`
+    puede devolver (código HTTP, cuerpo) para simular errores como el 429.
+    """
+
+    def __init__(self, latency=0.0, error_hook=None):
+        self.latency = latency
+        self.error_hook = error_hook
+        self.calls = []
+        self.uploaded_bytes = 0
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _result(self, method, params):
+        if method == "getMe":
+            return FAKE_BOT_USER
+        if method in ("sendMessage", "editMessageText", "sendPhoto", "sendDocument"):
+            chat_id = params.get("chat_id", 0)
+            message = make_message(next(self._message_ids), chat_id, params.get("text"), FAKE_BOT_USER)
+            if method == "sendPhoto":
+                message["photo"] = [_fake_photo(message["message_id"])]
+            return message
+        if method == "sendMediaGroup":
+            chat_id = params.get("chat_id", 0)
+            media = params.get("media") or []
+            if isinstance(media, str):
+                media = json.loads(media)
+            messages = []
+            for _ in media:
+                message = make_message(next(self._message_ids), chat_id, None, FAKE_BOT_USER)
+                message["photo"] = [_fake_photo(message["message_id"])]
+                messages.append(message)
+            return messages
+        if method == "getUpdates":
+            return []
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        self.calls.append((api_method, params))
+        if request_data is not None and request_data.contains_files:
+            self.uploaded_bytes += sum(len(part[1]) for part in request_data.multipart_data.values())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_hook is not None:
+            error = self.error_hook(api_method, params)
+            if error is not None:
+                status, body = error
+                return status, json.dumps(body).encode()
+        body = {"ok": True, "result": self._result(api_method, params)}
+        return 200, json.dumps(body).encode()
+
+    def calls_to(self, api_method):
+        """Parámetros de todas las llamadas a un método de la API"""
+        return [params for method, params in self.calls if method == api_method]
+
+
+def _fake_photo(message_id):
+    return {
+        "file_id": f"fake-file-{message_id}",
+        "file_unique_id": f"fake-unique-{message_id}",
+        "width": 320,
+        "height": 320,
+    }
+
+
+def too_many_requests(retry_after=1):
+    """Respuesta de error 429 de la Bot API"""
+    return 429, {
+        "ok": False,
+        "error_code": 429,
+        "description": f"Too Many Requests: retry after {retry_after}",
+        "parameters": {"retry_after": retry_after},
+    }
+
+
+class FakeTelegramClient:
+    """Envía actualizaciones a un webhook igual que lo haría Telegram.
+
+    Con `transport=httpx.ASGITransport(app=api)` se ejecuta en el mismo
+    proceso, sin abrir puertos.
+    """
+
+    def __init__(self, base_url, webhook_path="/telegram", secret_token=None, transport=None):
+        self.webhook_path = webhook_path
+        headers = {SECRET_TOKEN_HEADER: secret_token} if secret_token else {}
+        self._client = httpx.AsyncClient(base_url=base_url, headers=headers, transport=transport)
+        self._update_ids = itertools.count(1)
+
+    async def send_update(self, update):
+        """Envía una actualización (diccionario JSON) y devuelve el código HTTP"""
+        response = await self._client.post(self.webhook_path, json=update)
+        return response.status_code
+
+    async def send_text(self, user_id, text):
+        """Envía un mensaje de texto de un usuario"""
+        return await self.send_update(message_update(next(self._update_ids), user_id, text))
+
+    async def press_button(self, user_id, data):
+        """Envía la pulsación de un botón inline"""
+        return await self.send_update(callback_update(next(self._update_ids), user_id, data))
+
+    async def aclose(self):
+        await self._client.aclose()
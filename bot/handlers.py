@@ -0,0 +1,754 @@
+import asyncio
+import datetime
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import ContextTypes, ConversationHandler
+
+from broadcast import BroadcastStats, run_broadcast
+from config import get_settings
+from database import (
+    run_db, get_engine, get_roles, get_catalog_index, is_admin, is_super_admin, set_user_roles,
+    get_user_async, save_user_async,
+    claim_due_reminders, release_reminders,
+    reserve_stock, cancel_reservations, release_expired_reservations, get_cart, checkout,
+    get_pending_images, save_product_images, get_product_images, record_image_file_ids, discard_thumbnails,
+    get_user_chunk, create_broadcast, save_broadcast_progress, get_unfinished_broadcasts
+)
+from db_engine import get_pool_stats
+from images import ThumbnailStore, fetch_image, generate_thumbnails, send_album
+from keyboards import (
+    Keyboards, HELP_TEXT, CONTACT_TEXT, ADMIN_PANEL_TEXT,
+    BUTTON_INFO, BUTTON_CATALOG, BUTTON_APPOINTMENT, BUTTON_HELP, BUTTON_CONTACT, BUTTON_ADMIN
+)
+from metrics import metrics
+from replies import in_order, together
+from router import TextRouter
+
+logger = logging.getLogger(__name__)
+
+###########################################
+# TECLADOS
+###########################################
+
+@functools.cache
+def get_keyboards():
+    """Teclados precalculados con las URLs de las WebApps de la configuración"""
+    settings = get_settings()
+    return Keyboards(settings.catalog_webapp_url, settings.appointments_webapp_url, settings.admin_webapp_url)
+
+def get_main_keyboard(is_admin=False):
+    """Retorna el teclado principal (con el botón de Admin para administradores)"""
+    return get_keyboards().main_for(is_admin)
+
+def get_webapp_keyboard():
+    """Retorna el teclado con botones para las WebApps"""
+    return get_keyboards().webapp
+
+def get_admin_keyboard():
+    """Retorna el teclado para administradores"""
+    return get_keyboards().admin
+
+###########################################
+# ESTADOS PARA CONVERSACIONES
+###########################################
+
+# Estados para el formulario de usuario
+NAME, PHONE, EMAIL, ADDRESS = range(4)
+
+###########################################
+# MANEJADORES PARA COMANDOS Y CALLBACKS
+###########################################
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el comando /start"""
+    user_id = update.effective_user.id
+    username = update.effective_user.username
+    
+    logger.info("Comando /start recibido de usuario: %s", user_id, extra={"username": username})
+    
+    # Comprobar si el usuario existe en la base de datos (una sola búsqueda)
+    user_data = await get_user_async(user_id)
+    if user_data is None:
+        logger.info("Usuario %s no existe, iniciando registro", user_id)
+        await update.message.reply_text(
+            f"¡Hola {username}! Bienvenido a nuestra tienda de ropa. "
+            f"Para comenzar, necesito algunos datos básicos."
+        )
+        # Iniciar conversación para recopilar datos
+        await update.message.reply_text("Por favor, introduce tu nombre completo:")
+        return NAME
+    else:
+        logger.info("Usuario %s ya existe, mostrando menú principal", user_id)
+        
+        # Utilizar reply_text con reply_markup para mostrar el teclado
+        keyboard = get_main_keyboard(is_admin(user_id))
+        await update.message.reply_text(
+            f"¡Bienvenido de nuevo, {user_data['name']}! ¿En qué puedo ayudarte hoy?",
+            reply_markup=keyboard
+        )
+        # Mostrar el teclado con los botones de WebApp
+        webapp_keyboard = get_webapp_keyboard()
+        await update.message.reply_text(
+            "También puedes acceder directamente a nuestras aplicaciones:",
+            reply_markup=webapp_keyboard
+        )
+        return ConversationHandler.END
+
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el comando /admin"""
+    user_id = update.effective_user.id
+    
+    # Verificar si el usuario es administrador
+    if is_admin(user_id):
+        keyboard = get_admin_keyboard()
+        await update.message.reply_text(
+            "Panel de Administración. Selecciona una opción:",
+            reply_markup=keyboard
+        )
+    else:
+        await update.message.reply_text("No tienes permisos para acceder a esta función.")
+
+async def handle_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de información del usuario"""
+    query = update.callback_query
+    # Responder al callback no tiene que esperar a la búsqueda ni a la edición
+    _, state = await together(query.answer(), _show_user_info(query, update.effective_user.id))
+    return state
+
+async def _show_user_info(query, user_id):
+    user_data = await get_user_async(user_id)
+    
+    if user_data:
+        # Mostrar información del usuario con opción para editar
+        await query.edit_message_text(
+            f"📝 *Tu información*\n\n"
+            f"*Nombre:* {user_data['name']}\n"
+            f"*Teléfono:* {user_data['phone']}\n"
+            f"*Email:* {user_data['email']}\n"
+            f"*Dirección:* {user_data['address']}\n",
+            reply_markup=get_keyboards().user_info,
+            parse_mode='Markdown'
+        )
+    else:
+        # Iniciar formulario si no hay datos
+        await query.edit_message_text("Vamos a registrar tus datos. ¿Cuál es tu nombre completo?")
+        return NAME
+
+async def user_info_form(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inicia el formulario para recopilar información del usuario"""
+    logger.info("Iniciando formulario de registro")
+    await update.message.reply_text("Por favor, introduce tu nombre completo:")
+    return NAME  
+
+async def name_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    logger.debug("Registro de %s: nombre recibido", update.effective_user.id, extra={"full_name": update.message.text})
+    context.user_data['name'] = update.message.text
+    await update.message.reply_text("Gracias. Ahora necesito tu número de teléfono:")
+    return PHONE
+
+async def phone_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    logger.debug("Registro de %s: teléfono recibido", update.effective_user.id, extra={"phone": update.message.text})
+    context.user_data['phone'] = update.message.text
+    await update.message.reply_text("Perfecto. Ahora tu correo electrónico:")
+    return EMAIL
+
+async def email_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    logger.debug("Registro de %s: email recibido", update.effective_user.id, extra={"email": update.message.text})
+    context.user_data['email'] = update.message.text
+    await update.message.reply_text("Por último, necesito tu dirección de entrega:")
+    return ADDRESS
+
+async def address_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    logger.debug("Registro de %s: dirección recibida", user_id, extra={"address": update.message.text})
+    context.user_data['address'] = update.message.text
+    
+    # Guardar datos del usuario
+    save_success = await save_user_async(
+        user_id, 
+        context.user_data['name'], 
+        context.user_data['phone'], 
+        context.user_data['email'], 
+        context.user_data['address']
+    )
+    
+    logger.info("Registro de %s guardado: %s", user_id, save_success)
+    
+    # Mostrar teclado principal
+    keyboard = get_main_keyboard(is_admin(user_id))
+    
+    if save_success:
+        await update.message.reply_text(
+            "¡Gracias! Tus datos han sido guardados correctamente.",
+            reply_markup=keyboard
+        )
+        
+        # NO intentes enviar los botones WebApp hasta que tengas una URL HTTPS
+        if get_settings().base_url.startswith("https://"):
+            # Mostrar botones de WebApp solo si tenemos HTTPS
+            webapp_keyboard = get_webapp_keyboard()
+            await update.message.reply_text(
+                "Puedes acceder a nuestros servicios usando estos botones:",
+                reply_markup=webapp_keyboard
+            )
+    else:
+        # Manejar el error de guardado
+        await update.message.reply_text(
+            "Hubo un problema al guardar tus datos. Por favor, intenta nuevamente más tarde.",
+            reply_markup=keyboard
+        )
+    
+    return ConversationHandler.END
+
+async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de ayuda"""
+    query = update.callback_query
+    await together(
+        query.answer(),
+        query.edit_message_text(
+            HELP_TEXT,
+            reply_markup=get_keyboards().back,
+            parse_mode='Markdown'
+        )
+    )
+
+async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de contacto"""
+    query = update.callback_query
+    await together(
+        query.answer(),
+        query.edit_message_text(
+            CONTACT_TEXT,
+            reply_markup=get_keyboards().back,
+            parse_mode='Markdown'
+        )
+    )
+
+async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para volver al menú principal"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    
+    # Los dos mensajes nuevos van en orden (teclado principal y después
+    # WebApps); la respuesta al callback y el borrado del mensaje anterior con
+    # los botones inline no dependen de ellos y se envían a la vez
+    await together(
+        query.answer(),
+        in_order(
+            query.message.reply_text(
+                "¿En qué puedo ayudarte hoy?",
+                reply_markup=get_main_keyboard(is_admin(user_id))
+            ),
+            query.message.reply_text(
+                "Puedes acceder a nuestros servicios:",
+                reply_markup=get_webapp_keyboard()
+            )
+        ),
+        query.message.delete()
+    )
+
+###########################################
+# BOTONES DEL TECLADO PRINCIPAL
+###########################################
+
+# Los botones del teclado se atienden en un grupo previo al de la conversación
+# de registro, así que pulsar un botón nunca se toma como respuesta del formulario.
+TEXT_ROUTER_GROUP = -1
+TEXT_ROUTER = TextRouter()
+
+@TEXT_ROUTER.route(BUTTON_ADMIN)
+async def handle_admin_panel_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Panel Admin"""
+    user_id = update.effective_user.id
+    
+    # Verificar que el usuario realmente sea admin (seguridad adicional)
+    if is_admin(user_id):
+        await update.message.reply_text(
+            ADMIN_PANEL_TEXT,
+            reply_markup=get_admin_keyboard(),
+            parse_mode='Markdown'
+        )
+    else:
+        # Por seguridad, aunque no debería ocurrir
+        await update.message.reply_text("No tienes permisos para acceder a esta función.")
+
+@TEXT_ROUTER.route(BUTTON_INFO)
+async def handle_info_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Información"""
+    user_data = await get_user_async(update.effective_user.id)
+    
+    if user_data:
+        # Mostrar información del usuario
+        await update.message.reply_text(
+            f"📝 *Tu información*\n\n"
+            f"*Nombre:* {user_data['name']}\n"
+            f"*Teléfono:* {user_data['phone']}\n"
+            f"*Email:* {user_data['email']}\n"
+            f"*Dirección:* {user_data['address']}\n",
+            parse_mode='Markdown'
+        )
+    else:
+        await update.message.reply_text("No tenemos tus datos registrados. Por favor, escribe /start para registrarte.")
+
+@TEXT_ROUTER.route(BUTTON_CATALOG)
+async def handle_catalog_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Catálogo"""
+    await update.message.reply_text(
+        "Puedes explorar nuestro catálogo haciendo clic en el botón a continuación:",
+        reply_markup=get_keyboards().catalog
+    )
+
+@TEXT_ROUTER.route(BUTTON_APPOINTMENT)
+async def handle_appointment_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Agendar Cita"""
+    await update.message.reply_text(
+        "Puedes agendar una cita haciendo clic en el botón a continuación:",
+        reply_markup=get_keyboards().appointments
+    )
+
+@TEXT_ROUTER.route(BUTTON_HELP)
+async def handle_help_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Ayuda"""
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
+
+@TEXT_ROUTER.route(BUTTON_CONTACT)
+async def handle_contact_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para el botón de Contacto"""
+    await update.message.reply_text(CONTACT_TEXT, parse_mode='Markdown')
+
+###########################################
+# GESTIÓN DE ROLES
+###########################################
+
+async def _change_role(update: Update, context: ContextTypes.DEFAULT_TYPE, grant):
+    """Concede o retira el rol de administrador (o de superadministrador con 'super')"""
+    if not is_super_admin(update.effective_user.id):
+        await update.message.reply_text("No tienes permisos para acceder a esta función.")
+        return
+    
+    command = "grant_admin" if grant else "revoke_admin"
+    if not context.args or not context.args[0].lstrip("-").isdigit():
+        await update.message.reply_text(f"Uso: /{command} <telegram_id> [super]")
+        return
+    
+    target_id = int(context.args[0])
+    super_role = len(context.args) > 1 and context.args[1].lower() == "super"
+    if grant:
+        roles = {'is_admin': True, 'is_super_admin': True} if super_role else {'is_admin': True}
+    else:
+        roles = {'is_super_admin': False} if super_role else {'is_admin': False, 'is_super_admin': False}
+    
+    if not await run_db(set_user_roles, target_id, **roles):
+        await update.message.reply_text(f"No hay ningún usuario registrado con el ID {target_id}.")
+        return
+    
+    role_name = "superadministrador" if super_role else "administrador"
+    if grant:
+        await update.message.reply_text(f"✅ {target_id} ahora es {role_name}.")
+    elif target_id in get_roles().static_admins or target_id in get_roles().static_super_admins:
+        await update.message.reply_text(
+            f"Rol de {role_name} retirado en la base de datos, pero {target_id} sigue en "
+            f"ADMIN_USER_IDS/SUPER_ADMIN_USER_IDS."
+        )
+    else:
+        await update.message.reply_text(f"✅ {target_id} ya no es {role_name}.")
+
+async def grant_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /grant_admin <telegram_id> [super]"""
+    await _change_role(update, context, grant=True)
+
+async def revoke_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /revoke_admin <telegram_id> [super]"""
+    await _change_role(update, context, grant=False)
+
+async def admins_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /admins: lista los administradores actuales"""
+    if not is_super_admin(update.effective_user.id):
+        await update.message.reply_text("No tienes permisos para acceder a esta función.")
+        return
+    
+    roles = get_roles()
+    super_admins = roles.super_admin_ids()
+    lines = [
+        f"• {telegram_id}{' (super)' if telegram_id in super_admins else ''}"
+        for telegram_id in sorted(roles.admin_ids())
+    ]
+    await update.message.reply_text("🔐 Administradores:\n" + "\n".join(lines))
+
+async def refresh_roles(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: recarga los roles para ver cambios hechos fuera del bot"""
+    await run_db(get_roles().refresh)
+
+###########################################
+# DIFUSIONES
+###########################################
+
+async def deliver_broadcast(bot, broadcast):
+    """Envía (o reanuda) una difusión guardando el progreso tras cada bloque"""
+    async def fetch_recipients(after_id, limit):
+        return await run_db(get_user_chunk, after_id, limit)
+    
+    async def save_checkpoint(stats):
+        await run_db(save_broadcast_progress, broadcast['id'], stats.last_user_id, stats.sent, stats.failed)
+    
+    stats = BroadcastStats(broadcast['sent'], broadcast['failed'], broadcast['last_user_id'])
+    stats = await run_broadcast(
+        bot, broadcast['text'], fetch_recipients, save_checkpoint,
+        stats=stats, global_rate=get_settings().broadcast_rate
+    )
+    await run_db(save_broadcast_progress, broadcast['id'], stats.last_user_id, stats.sent, stats.failed, "done")
+    logger.info("Difusión %s terminada: %d enviados, %d fallidos", broadcast['id'], stats.sent, stats.failed)
+    return stats
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /broadcast <texto>: envía un mensaje a todos los usuarios"""
+    user_id = update.effective_user.id
+    if not is_super_admin(user_id):
+        await update.message.reply_text("No tienes permisos para acceder a esta función.")
+        return
+    
+    text = update.message.text.partition(" ")[2].strip()
+    if not text:
+        await update.message.reply_text("Uso: /broadcast <mensaje>")
+        return
+    
+    broadcast_id = await run_db(create_broadcast, text, user_id)
+    broadcast = {'id': broadcast_id, 'text': text, 'last_user_id': 0, 'sent': 0, 'failed': 0}
+    context.application.create_task(deliver_broadcast(context.bot, broadcast))
+    await update.message.reply_text(f"Difusión {broadcast_id} iniciada.")
+
+async def resume_broadcasts(application):
+    """Reanuda en segundo plano las difusiones que quedaron a medias"""
+    for broadcast in await run_db(get_unfinished_broadcasts):
+        logger.info("Reanudando difusión %s desde el usuario %s", broadcast['id'], broadcast['last_user_id'])
+        application.create_task(deliver_broadcast(application.bot, broadcast))
+
+###########################################
+# RECORDATORIOS DE CITAS
+###########################################
+
+# Métricas del último ciclo y acumuladas. El retraso es el tiempo que llevaba
+# pendiente un recordatorio: desde (fecha de la cita - antelación), o desde que
+# se creó la cita si se reservó ya dentro de la ventana.
+reminder_stats = {
+    'runs': 0,
+    'sent': 0,
+    'failed': 0,
+    'retried': 0,
+    'last_run_at': None,
+    'last_duration_seconds': 0.0,
+    'last_batch': 0,
+    'last_max_lag_seconds': 0.0,
+    'max_lag_seconds': 0.0
+}
+
+async def send_reminder(bot, appointment):
+    """Envía el recordatorio de una cita.
+    
+    Devuelve True si se entregó, False si no tiene sentido reintentar (el
+    usuario bloqueó el bot) y None si hay que reintentar en el siguiente ciclo.
+    """
+    try:
+        await bot.send_message(
+            chat_id=appointment['telegram_id'],
+            text=(
+                f"⏰ Hola {appointment['user_name']}, te recordamos tu cita del "
+                f"{appointment['date']:%d/%m/%Y} a las {appointment['date']:%H:%M}."
+            )
+        )
+        return True
+    except (Forbidden, BadRequest) as e:
+        logger.info("Recordatorio de la cita %s descartado: %s", appointment['id'], e)
+        return False
+    except Exception as e:
+        logger.warning("No se pudo enviar el recordatorio de la cita %s: %s", appointment['id'], e)
+        return None
+
+def _utc_to_local(moment):
+    """Fecha UTC sin zona (created_at) en la hora local sin zona de las citas"""
+    return moment.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+def reminder_lag(appointment, now):
+    """Segundos que llevaba pendiente el recordatorio de una cita (`now` en hora local, como las citas)"""
+    due_at = appointment['date'] - get_settings().reminder_lead
+    if appointment['created_at'] is not None:
+        due_at = max(due_at, _utc_to_local(appointment['created_at']))
+    return max(0.0, (now - due_at).total_seconds())
+
+async def send_appointment_reminders(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: envía los recordatorios de las citas próximas"""
+    settings = get_settings()
+    started = time.perf_counter()
+    now = datetime.datetime.now()
+    sent = failed = 0
+    max_lag = 0.0
+    # Las citas a reintentar conservan la reclamación hasta el final de esta
+    # pasada: si se liberasen antes, el siguiente lote volvería a reclamarlas
+    retry = []
+    try:
+        while True:
+            due = await run_db(claim_due_reminders, now, settings.reminder_lead, settings.reminder_batch_size)
+            if not due:
+                break
+            results = await asyncio.gather(*(send_reminder(context.bot, a) for a in due))
+            retry.extend(a['id'] for a, ok in zip(due, results) if ok is None)
+            sent += sum(1 for ok in results if ok)
+            failed += sum(1 for ok in results if ok is False)
+            max_lag = max([max_lag] + [reminder_lag(a, now) for a in due])
+            if len(due) < settings.reminder_batch_size:
+                break
+    finally:
+        await run_db(release_reminders, retry)
+    
+    reminder_stats['runs'] += 1
+    reminder_stats['sent'] += sent
+    reminder_stats['failed'] += failed
+    reminder_stats['retried'] += len(retry)
+    reminder_stats['last_run_at'] = now
+    reminder_stats['last_duration_seconds'] = time.perf_counter() - started
+    reminder_stats['last_batch'] = sent + failed
+    reminder_stats['last_max_lag_seconds'] = max_lag
+    reminder_stats['max_lag_seconds'] = max(reminder_stats['max_lag_seconds'], max_lag)
+    if sent or failed or retry:
+        logger.info(
+            "Recordatorios: %d enviados, %d fallidos, %d para reintentar, retraso máximo %.0fs",
+            sent, failed, len(retry), max_lag
+        )
+
+###########################################
+# RESERVAS Y PEDIDOS
+###########################################
+
+async def reserve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /reserve <id_producto> [cantidad]: aparta stock durante un tiempo"""
+    args = context.args or []
+    if not 1 <= len(args) <= 2 or not all(arg.isdigit() for arg in args) or (len(args) == 2 and args[1] == "0"):
+        await update.message.reply_text("Uso: /reserve <id_producto> [cantidad]")
+        return
+    
+    user_id = update.effective_user.id
+    if await get_user_async(user_id) is None:
+        await update.message.reply_text("Antes de comprar necesitamos tus datos. Escribe /start para registrarte.")
+        return
+    
+    settings = get_settings()
+    product_id = int(args[0])
+    quantity = int(args[1]) if len(args) == 2 else 1
+    hold = settings.reservation_hold
+    cart = await run_db(get_cart, user_id)
+    in_cart = sum(item['quantity'] for item in cart if item['product_id'] == product_id)
+    if (
+        in_cart + quantity > settings.reservation_max_per_product
+        or sum(item['quantity'] for item in cart) + quantity > settings.reservation_max_per_user
+    ):
+        await update.message.reply_text(
+            f"Puedes reservar como máximo {settings.reservation_max_per_product} unidades de cada producto "
+            f"y {settings.reservation_max_per_user} en total. Revisa tu carrito con /cart."
+        )
+        return
+    reservation_id = await run_db(
+        reserve_stock, user_id, product_id, quantity, hold,
+        settings.reservation_max_per_product, settings.reservation_max_per_user
+    )
+    if reservation_id is None:
+        await update.message.reply_text("No queda stock suficiente de ese producto.")
+        return
+    await update.message.reply_text(
+        f"✅ Reservadas {quantity} unidades del producto {product_id} durante "
+        f"{hold.total_seconds() / 60:.0f} minutos.\n"
+        f"Usa /cart para ver tu carrito y /checkout para confirmar el pedido."
+    )
+
+async def cart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /cart: muestra las reservas vigentes del usuario"""
+    cart = await run_db(get_cart, update.effective_user.id)
+    if not cart:
+        await update.message.reply_text("Tu carrito está vacío. Reserva productos con /reserve.")
+        return
+    lines = [f"• {item['quantity']} × {item['name']} ({item['price']:.2f} €)" for item in cart]
+    total = sum(item['quantity'] * item['price'] for item in cart)
+    await update.message.reply_text(
+        "🛒 Tu carrito:\n" + "\n".join(lines) + f"\n\nTotal: {total:.2f} €\n"
+        "/checkout para confirmar, /clear_cart para vaciarlo."
+    )
+
+async def checkout_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /checkout: convierte el carrito en un pedido"""
+    user_id = update.effective_user.id
+    if await get_user_async(user_id) is None:
+        await update.message.reply_text("Antes de comprar necesitamos tus datos. Escribe /start para registrarte.")
+        return
+    order = await run_db(checkout, user_id)
+    if order is None:
+        await update.message.reply_text("No tienes reservas vigentes. Reserva productos con /reserve.")
+        return
+    units = sum(item['quantity'] for item in order['items'])
+    await update.message.reply_text(
+        f"✅ Pedido {order['id']} confirmado: {units} unidades, total {order['total']:.2f} €."
+    )
+
+async def clear_cart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /clear_cart: anula las reservas del usuario"""
+    units = await run_db(cancel_reservations, update.effective_user.id)
+    if units:
+        await update.message.reply_text(f"Carrito vaciado: {units} unidades liberadas.")
+    else:
+        await update.message.reply_text("Tu carrito ya estaba vacío.")
+
+async def release_reservations(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: devuelve al stock las reservas caducadas, por bloques"""
+    batch_size = get_settings().reservation_release_batch_size
+    now = datetime.datetime.utcnow()
+    released = 0
+    while True:
+        count = await run_db(release_expired_reservations, now, batch_size)
+        released += count
+        if count < batch_size:
+            break
+    if released:
+        logger.info("Reservas caducadas liberadas: %d", released)
+
+###########################################
+# CONSULTAS INLINE
+###########################################
+
+# Resultados por página (Telegram admite hasta 50)
+INLINE_PAGE_SIZE = 20
+
+def _absolute_url(url):
+    """Las imágenes con ruta relativa las sirve el servidor web de las WebApps"""
+    if not url or url.startswith(("http://", "https://")):
+        return url or None
+    return f"{get_settings().base_url}/{url.lstrip('/')}"
+
+def _product_result(product, reply_markup):
+    description = product.get('description') or ""
+    details = [f"{product['price']:.2f} €", description if product.get('stock') else "Sin stock"]
+    return InlineQueryResultArticle(
+        id=str(product['id']),
+        title=product['name'],
+        description=" · ".join(filter(None, details)),
+        thumbnail_url=_absolute_url(product.get('image_url')),
+        input_message_content=InputTextMessageContent(
+            f"🛍️ {product['name']}\n💶 {product['price']:.2f} €\n\n{description}".rstrip()
+        ),
+        reply_markup=reply_markup
+    )
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador de consultas inline: busca en el catálogo en memoria, sin consultar la base de datos"""
+    query = update.inline_query
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    products, more = get_catalog_index().search(query.query, offset, INLINE_PAGE_SIZE)
+    settings = get_settings()
+    reply_markup = get_keyboards().catalog_link if settings.base_url.startswith("https://") else None
+    await query.answer(
+        [_product_result(product, reply_markup) for product in products],
+        cache_time=settings.inline_cache_time,
+        next_offset=str(offset + INLINE_PAGE_SIZE) if more else ""
+    )
+
+async def refresh_catalog_snapshot(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: recarga el catálogo en memoria de las consultas inline"""
+    await run_db(get_catalog_index().refresh)
+
+###########################################
+# FOTOS DE PRODUCTOS
+###########################################
+
+@functools.cache
+def get_thumbnail_store():
+    """Miniaturas en disco (THUMBNAIL_DIR)"""
+    settings = get_settings()
+    return ThumbnailStore(settings.thumbnail_dir, max_size=settings.thumbnail_max_size)
+
+@functools.cache
+def get_image_executor():
+    """Hilos para descargar y redimensionar imágenes, aparte de los de la base de datos"""
+    return ThreadPoolExecutor(max_workers=get_settings().image_workers, thread_name_prefix="images")
+
+@functools.cache
+def get_image_client():
+    """Cliente HTTP con conexiones persistentes para descargar las imágenes originales"""
+    return httpx.Client(timeout=10.0, follow_redirects=True)
+
+def _fetch_product_image(url):
+    return fetch_image(get_image_client(), _absolute_url(url))
+
+async def process_product_images(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: genera las miniaturas de los productos nuevos o con la imagen cambiada"""
+    batch_size = get_settings().image_batch_size
+    processed = 0
+    while True:
+        pending = await run_db(get_pending_images, batch_size)
+        if not pending:
+            break
+        results = await generate_thumbnails(pending, get_thumbnail_store(), _fetch_product_image, get_image_executor())
+        await run_db(save_product_images, results)
+        processed += len(pending)
+        if len(pending) < batch_size:
+            break
+    if processed:
+        logger.info("Miniaturas de productos procesadas: %d", processed)
+
+async def send_product_photos(bot, chat_id, products):
+    """Envía las fotos de unos productos; las ya subidas se reenvían por file_id. Devuelve cuántas envió"""
+    images = await run_db(get_product_images, [p['id'] for p in products])
+    photos = [
+        (*images[p['id']], f"{p['name']} · {p['price']:.2f} €")
+        for p in products if p['id'] in images
+    ]
+    if not photos:
+        return 0
+    uploaded, missing = await send_album(bot, chat_id, photos, get_thumbnail_store(), get_image_executor())
+    await run_db(record_image_file_ids, uploaded)
+    if missing:
+        # Vuelven a quedar pendientes: process_product_images las genera de nuevo
+        logger.warning("Faltan %d miniaturas sin file_id en el disco; se regenerarán", len(missing))
+        await run_db(discard_thumbnails, missing)
+    return sum(1 for key, _, _ in photos if key not in missing)
+
+async def photos_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manejador para /photos <búsqueda>: envía las fotos de los productos que coinciden"""
+    text = update.message.text.partition(" ")[2].strip()
+    products, _ = get_catalog_index().search(text, 0, INLINE_PAGE_SIZE)
+    if not await send_product_photos(context.bot, update.effective_chat.id, products):
+        await update.message.reply_text("No hay fotos de productos que coincidan con tu búsqueda.")
+
+###########################################
+# MÉTRICAS
+###########################################
+
+def render_reminder_metrics():
+    """Contadores y retraso del trabajo de recordatorios en formato Prometheus"""
+    stats = dict(reminder_stats)
+    lines = []
+    for metric, key, kind in (
+        ("bot_reminder_runs_total", "runs", "counter"),
+        ("bot_reminders_sent_total", "sent", "counter"),
+        ("bot_reminders_failed_total", "failed", "counter"),
+        ("bot_reminders_retried_total", "retried", "counter"),
+        ("bot_reminder_last_run_duration_seconds", "last_duration_seconds", "gauge"),
+        ("bot_reminder_last_run_batch", "last_batch", "gauge"),
+        ("bot_reminder_last_run_max_lag_seconds", "last_max_lag_seconds", "gauge"),
+        ("bot_reminder_max_lag_seconds", "max_lag_seconds", "gauge"),
+    ):
+        lines += [f"# TYPE {metric} {kind}", f"{metric} {stats[key]}"]
+    return "\n".join(lines) + "\n"
+
+def get_metrics_text():
+    """Métricas de los manejadores, del pool de conexiones y de los recordatorios en formato Prometheus"""
+    return metrics.render_prometheus(pool=get_pool_stats(get_engine())) + render_reminder_metrics()
+
+async def log_metrics_summary(context: ContextTypes.DEFAULT_TYPE):
+    """Trabajo periódico: resume la actividad de cada manejador desde el último resumen"""
+    lines = metrics.summary()
+    if lines:
+        logger.info("Métricas de manejadores:\n%s", "\n".join(lines))
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+from telegram import InputMediaPhoto
+
+logger = logging.getLogger(__name__)
+
+# Lado mayor de las miniaturas: Telegram muestra las fotos a 1280 px como mucho
+DEFAULT_MAX_SIZE = 1280
+DEFAULT_QUALITY = 85
+# Imágenes originales más grandes no se descargan
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# Fotos por álbum (límite de sendMediaGroup)
+ALBUM_SIZE = 10
+
+
+class ThumbnailStore:
+    """Miniaturas JPEG en disco con el tamaño acotado, indexadas por hash.
+
+    La clave es el SHA-256 de la imagen original junto con el tamaño y la
+    calidad, así que la misma imagen en varios productos se procesa y se sube
+    a Telegram una sola vez, y cambiar THUMBNAIL_MAX_SIZE genera claves nuevas.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, quality=DEFAULT_QUALITY):
+        self.directory = directory
+        self.max_size = max_size
+        self.quality = quality
+
+    def key(self, data):
+        digest = hashlib.sha256(data)
+        digest.update(f":{self.max_size}:{self.quality}".encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.jpg")
+
+    def read(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def save(self, data):
+        """Guarda la miniatura de una imagen (si no existe ya) y devuelve su clave"""
+        key = self.key(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        thumbnail = make_thumbnail(data, self.max_size, self.quality)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: otro proceso nunca ve una miniatura a medias
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(thumbnail)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return key
+
+
+def make_thumbnail(data, max_size=DEFAULT_MAX_SIZE, quality=DEFAULT_QUALITY):
+    """JPEG con el lado mayor acotado a `max_size`, girado según su EXIF"""
+    # Pillow solo se importa donde se generan miniaturas
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Los JPEG se decodifican ya reducidos (escalado en el dominio DCT)
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def fetch_image(client, url):
+    """Descarga una imagen con un httpx.Client, sin pasar de MAX_SOURCE_BYTES"""
+    with client.stream("GET", url) as response:
+        response.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in response.iter_bytes():
+            size += len(chunk)
+            if size > MAX_SOURCE_BYTES:
+                raise ValueError(f"Imagen demasiado grande: {url}")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def generate_thumbnails(pending, store, fetch, executor):
+    """Genera en `executor` las miniaturas de [(product_id, url)].
+
+    Devuelve [(product_id, url, clave)], con clave None si la imagen no se
+    pudo descargar o procesar.
+    """
+    loop = asyncio.get_running_loop()
+
+    def build(url):
+        return store.save(fetch(url))
+
+    async def process(product_id, url):
+        try:
+            key = await loop.run_in_executor(executor, build, url)
+        except Exception as e:
+            logger.warning("No se pudo generar la miniatura del producto %s (%s): %s", product_id, url, e)
+            key = None
+        return product_id, url, key
+
+    return await asyncio.gather(*(process(product_id, url) for product_id, url in pending))
+
+
+async def send_album(bot, chat_id, photos, store, executor=None):
+    """Envía fotos [(clave, file_id o None, pie)] en álbumes de hasta ALBUM_SIZE.
+
+    Las fotos con file_id se reenvían sin subir nada; el resto se sube desde
+    el disco. Las que no tienen file_id ni archivo (por ejemplo, tras un
+    despliegue sin volumen persistente) se omiten. Devuelve ({clave: file_id}
+    de las fotos subidas en este envío, {claves omitidas}).
+    """
+    loop = asyncio.get_running_loop()
+    uploaded = {}
+    missing = set()
+    for start in range(0, len(photos), ALBUM_SIZE):
+        chunk = []
+        for key, file_id, caption in photos[start:start + ALBUM_SIZE]:
+            # Lo subido en un álbum anterior de este mismo envío ya tiene file_id
+            content = file_id or uploaded.get(key)
+            if content is None and key not in missing:
+                try:
+                    content = await loop.run_in_executor(executor, store.read, key)
+                except FileNotFoundError:
+                    missing.add(key)
+            if content is not None:
+                chunk.append((key, file_id, caption, content))
+        if not chunk:
+            continue
+        if len(chunk) == 1:
+            # sendMediaGroup necesita al menos dos fotos
+            messages = [await bot.send_photo(chat_id, chunk[0][3], caption=chunk[0][2])]
+        else:
+            messages = await bot.send_media_group(
+                chat_id, [InputMediaPhoto(content, caption=caption) for _, _, caption, content in chunk]
+            )
+        for (key, file_id, _, _), message in zip(chunk, messages):
+            if not file_id and key not in uploaded and message.photo:
+                # La última es la de mayor resolución
+                uploaded[key] = message.photo[-1].file_id
+    return uploaded, missing
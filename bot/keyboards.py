@@ -0,0 +1,85 @@
+from telegram import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, WebAppInfo
+)
+
+# Etiquetas de los botones del teclado principal
+BUTTON_INFO = "📋 Información"
+BUTTON_CATALOG = "🛍️ Catálogo"
+BUTTON_APPOINTMENT = "📅 Agendar Cita"
+BUTTON_HELP = "❓ Ayuda"
+BUTTON_CONTACT = "📞 Contacto"
+BUTTON_ADMIN = "🔐 Panel Admin"
+
+HELP_TEXT = (
+    "🔍 *Centro de Ayuda*\n\n"
+    "Aquí encontrarás información útil sobre cómo usar nuestro bot:\n\n"
+    "• Para ver el catálogo: Toca en 'Catálogo'\n"
+    "• Para agendar una cita: Toca en 'Agendar Cita'\n"
+    "• Para ver tus datos: Toca en 'Información'\n"
+    "• Para comprar: /reserve <id> [cantidad], /cart y /checkout\n"
+    "• Para contactarnos: Toca en 'Contacto'\n\n"
+    "Si tienes dudas adicionales, no dudes en contactarnos."
+)
+
+CONTACT_TEXT = (
+    "📞 *Información de Contacto*\n\n"
+    "Puedes contactarnos a través de los siguientes medios:\n\n"
+    "📱 *Teléfono*: +34 912345678\n"
+    "📧 *Email*: info@tiendaropa.com\n"
+    "🏠 *Dirección*: Calle Principal 123, Madrid\n\n"
+    "Horario de atención:\n"
+    "Lunes a Viernes: 10:00 - 19:00\n"
+    "Sábados: 10:00 - 14:00"
+)
+
+ADMIN_PANEL_TEXT = (
+    "🔐 *Panel de Administración*\n\n"
+    "Selecciona una opción:"
+)
+
+
+class Keyboards:
+    """Teclados del bot construidos una sola vez al arrancar.
+
+    Los objetos de python-telegram-bot son inmutables, así que se pueden
+    reutilizar en todas las respuestas sin copiarlos.
+    """
+
+    def __init__(self, catalog_url, appointments_url, admin_url):
+        main_rows = [
+            [KeyboardButton(BUTTON_INFO)],
+            [KeyboardButton(BUTTON_CATALOG), KeyboardButton(BUTTON_APPOINTMENT)],
+            [KeyboardButton(BUTTON_HELP), KeyboardButton(BUTTON_CONTACT)],
+        ]
+        self.main = ReplyKeyboardMarkup(main_rows, resize_keyboard=True)
+        # Variante con el botón de Admin, solo para administradores
+        self.main_admin = ReplyKeyboardMarkup(main_rows + [[KeyboardButton(BUTTON_ADMIN)]], resize_keyboard=True)
+
+        back_button = InlineKeyboardButton("Volver", callback_data="back_to_main")
+        self.back = InlineKeyboardMarkup([[back_button]])
+        self.webapp = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🛍️ Ver Catálogo", web_app=WebAppInfo(catalog_url))],
+            [InlineKeyboardButton("📅 Agendar Cita", web_app=WebAppInfo(appointments_url))],
+            [back_button],
+        ])
+        self.admin = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🖥️ Panel de Administración", web_app=WebAppInfo(admin_url))]
+        ])
+        self.catalog = InlineKeyboardMarkup([
+            [InlineKeyboardButton("Ver Catálogo", web_app=WebAppInfo(catalog_url))]
+        ])
+        # Los mensajes enviados por consulta inline no admiten botones de WebApp
+        self.catalog_link = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🛍️ Ver catálogo", url=catalog_url)]
+        ])
+        self.appointments = InlineKeyboardMarkup([
+            [InlineKeyboardButton("Agendar Cita", web_app=WebAppInfo(appointments_url))]
+        ])
+        self.user_info = InlineKeyboardMarkup([
+            [InlineKeyboardButton("Editar información", callback_data="edit_info")],
+            [back_button],
+        ])
+
+    def main_for(self, is_admin):
+        """Teclado principal según el rol del usuario"""
+        return self.main_admin if is_admin else self.main
@@ -0,0 +1,237 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import threading
+import time
+
+# Registros que caben en la cola antes de empezar a descartarse
+DEFAULT_QUEUE_SIZE = 10000
+
+# Campos (pasados con extra=...) que contienen datos personales
+PII_FIELDS = frozenset({"full_name", "username", "phone", "email", "address", "text"})
+
+# Por si algún dato personal llega dentro del propio mensaje
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"\+\d[\d\s().-]{6,}\d|\b\d{3}(?: \d{2,3}){2,3}\b")
+# Token del bot (aparece, por ejemplo, en las URL que registra httpx)
+_BOT_TOKEN = re.compile(r"\d{6,}:[A-Za-z0-9_-]{30,}")
+
+# Atributos propios de LogRecord: el resto son campos añadidos con extra=...
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def mask(field, value):
+    """Versión enmascarada de un dato personal que permite reconocerlo sin mostrarlo"""
+    value = str(value)
+    if field == "email" and "@" in value:
+        local, _, domain = value.partition("@")
+        return f"{local[:1]}***@{domain}"
+    if field == "phone":
+        digits = [c for c in value if c.isdigit()]
+        return "***" + "".join(digits[-2:])
+    return value[:1] + "***"
+
+
+def redact(message):
+    """Enmascara emails, teléfonos y tokens del bot dentro de un texto"""
+    message = _BOT_TOKEN.sub("[token]", message)
+    message = _EMAIL.sub(lambda m: mask("email", m.group()), message)
+    return _PHONE.sub(lambda m: mask("phone", m.group()), message)
+
+
+###########################################
+# FORMATOS
+###########################################
+
+class RedactingFormatter(logging.Formatter):
+    """Formato de texto con los datos personales enmascarados (mensaje y trazas)"""
+
+    def format(self, record):
+        # Sobre la línea completa: Formatter.format reutiliza un exc_text ya generado
+        return redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos añadidos con extra=... y los datos personales enmascarados"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = mask(key, value) if key in PII_FIELDS else value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        if record.stack_info:
+            entry["stack"] = redact(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+###########################################
+# MUESTREO
+###########################################
+
+class _TokenBucket:
+    __slots__ = ("rate", "tokens", "updated")
+
+    def __init__(self, rate, now):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Muestreo y límite de registros por segundo por logger.
+
+    `sample_rates` ({"handlers": 0.1}) deja pasar esa fracción de los
+    registros y `rate_limits` ({"httpx": 20}) como mucho esos registros por
+    segundo; cada regla se aplica al logger indicado y a sus hijos. Los avisos
+    y errores pasan siempre. El primer registro que pasa después de descartar
+    otros del mismo logger lleva en `suppressed` cuántos se descartaron.
+    """
+
+    def __init__(self, sample_rates=None, rate_limits=None, random=random.random, clock=time.monotonic):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limits = dict(rate_limits or {})
+        self._random = random
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._buckets = {}
+        self._suppressed = {}
+
+    @staticmethod
+    def _lookup(rules, name):
+        while True:
+            if name in rules:
+                return name
+            if "." not in name:
+                return "" if "" in rules else None
+            name = name.rpartition(".")[0]
+
+    def _rule(self, name):
+        rule = self._rules.get(name)
+        if rule is None:
+            sample_key = self._lookup(self.sample_rates, name)
+            limit_key = self._lookup(self.rate_limits, name)
+            rule = self._rules[name] = (
+                1.0 if sample_key is None else self.sample_rates[sample_key],
+                limit_key,
+            )
+        return rule
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not (self.sample_rates or self.rate_limits):
+            return True
+        rate, limit_key = self._rule(record.name)
+        with self._lock:
+            keep = rate >= 1 or self._random() < rate
+            if keep and limit_key is not None:
+                now = self._clock()
+                bucket = self._buckets.get(limit_key)
+                if bucket is None:
+                    bucket = self._buckets[limit_key] = _TokenBucket(self.rate_limits[limit_key], now)
+                keep = bucket.take(now)
+            if not keep:
+                self._suppressed[record.name] = self._suppressed.get(record.name, 0) + 1
+                return False
+            suppressed = self._suppressed.pop(record.name, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+###########################################
+# COLA
+###########################################
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Deja los registros en una cola acotada sin bloquear a quien registra.
+
+    Solo se resuelve el mensaje (sus argumentos podrían cambiar después); el
+    formato y la escritura se hacen en el hilo del QueueListener. Con la cola
+    llena el registro se descarta y se cuenta en `dropped`.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            # La traza mantiene vivos los frames: se convierte ya en texto (enmascarado,
+            # porque los formatos reutilizan exc_text sin volver a generarlo)
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+
+def setup_logging(level=logging.INFO, json_output=True, text_format=None, sample_rates=None,
+                  rate_limits=None, queue_size=DEFAULT_QUEUE_SIZE, stream=None):
+    """Envía los registros del logger raíz a una cola que escribe en `stream` un hilo aparte.
+
+    Sustituye los manejadores del logger raíz y devuelve el manejador de la
+    cola. Al salir del proceso se escribe lo que quede pendiente.
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if json_output else RedactingFormatter(text_format))
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(SamplingFilter(sample_rates, rate_limits))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    return handler
+
+
+def stop_logging():
+    """Escribe los registros pendientes y detiene el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import datetime
+import json
+import sys
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, func, insert, select, text, update
+
+import database
+from config import configure_logging
+from database import Appointment, Product, User
+
+MODELS = {
+    "users": User,
+    "products": Product,
+    "appointments": Appointment,
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+###########################################
+# CONVERSIÓN DE VALORES
+###########################################
+
+def _to_text(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_value(column, value):
+    """Convierte un valor leído de CSV/JSONL al tipo de la columna"""
+    if value is None or value == "":
+        return None
+    if isinstance(column.type, Boolean):
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "si", "sí")
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, Float):
+        return float(value)
+    if isinstance(column.type, DateTime):
+        return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(value)
+    return value
+
+
+###########################################
+# LECTURA Y ESCRITURA DE ARCHIVOS
+###########################################
+
+def _read_rows(stream, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _RowWriter:
+    def __init__(self, stream, fmt, columns):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=columns)
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def _open(path, mode):
+    if path in (None, "-"):
+        return sys.stdout if "w" in mode else sys.stdin
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _guess_format(path, fmt):
+    if fmt:
+        return fmt
+    return "jsonl" if path and path.endswith((".jsonl", ".json")) else "csv"
+
+
+###########################################
+# EXPORTACIÓN E IMPORTACIÓN
+###########################################
+
+def export_table(model, stream, fmt, batch_size=DEFAULT_BATCH_SIZE):
+    """Vuelca una tabla en orden de id leyéndola por bloques; devuelve las filas escritas"""
+    table = model.__table__
+    columns = [c.name for c in table.columns]
+    writer = _RowWriter(stream, fmt, columns)
+    count = 0
+    with database.get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(select(table).order_by(table.c.id))
+        for row in result:
+            writer.write({name: _to_text(value) for name, value in row._mapping.items()})
+            count += 1
+    return count
+
+
+def _insert_batch(conn, table, rows):
+    """Inserta un lote con una sola sentencia, ignorando filas duplicadas si el motor lo permite"""
+    statement = insert(table)
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()
+    conn.execute(statement, rows)
+
+
+def _reset_sequence(conn, table):
+    # Tras insertar ids explícitos en PostgreSQL, la secuencia debe continuar desde el máximo
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+        ))
+
+
+def import_table(model, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, keep_ids=False):
+    """Importa filas por lotes en memoria constante; devuelve las filas leídas"""
+    table = model.__table__
+    columns = {c.name: c for c in table.columns if keep_ids or c.name != "id"}
+    count = 0
+    batch = []
+    with database.get_engine().begin() as conn:
+        for raw in _read_rows(stream, fmt):
+            batch.append({
+                name: _parse_value(columns[name], value)
+                for name, value in raw.items() if name in columns
+            })
+            if len(batch) >= batch_size:
+                _insert_batch(conn, table, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            _insert_batch(conn, table, batch)
+            count += len(batch)
+        if keep_ids:
+            _reset_sequence(conn, table)
+    return count
+
+
+###########################################
+# ROLES
+###########################################
+
+def set_roles(telegram_ids, **roles):
+    """Cambia is_admin/is_super_admin de varios usuarios por lotes; devuelve cuántos existían"""
+    changed = 0
+    with database.get_engine().begin() as conn:
+        for i in range(0, len(telegram_ids), database.BATCH_QUERY_SIZE):
+            chunk = telegram_ids[i:i + database.BATCH_QUERY_SIZE]
+            changed += conn.execute(update(User).where(User.telegram_id.in_(chunk)).values(**roles)).rowcount
+    return changed
+
+
+def _read_ids(args):
+    ids = list(args.telegram_ids)
+    if args.from_file:
+        with _open(args.from_file, "r") as f:
+            ids.extend(line.strip() for line in f if line.strip())
+    return [int(i) for i in ids]
+
+
+###########################################
+# LÍNEA DE COMANDOS
+###########################################
+
+def cmd_export(args):
+    fmt = _guess_format(args.output, args.format)
+    stream = _open(args.output, "w")
+    try:
+        count = export_table(MODELS[args.table], stream, fmt, args.batch_size)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"✅ {count} filas exportadas de {args.table}", file=sys.stderr)
+
+
+def cmd_import(args):
+    fmt = _guess_format(args.input, args.format)
+    stream = _open(args.input, "r")
+    try:
+        count = import_table(MODELS[args.table], stream, fmt, args.batch_size, args.keep_ids)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"✅ {count} filas procesadas en {args.table} (los duplicados se omiten)", file=sys.stderr)
+
+
+def cmd_roles(args):
+    telegram_ids = sorted(set(_read_ids(args)))
+    if not telegram_ids:
+        print("❌ Error: indica al menos un Telegram ID", file=sys.stderr)
+        return 1
+    if args.action == "grant":
+        # Un superadministrador también es administrador
+        roles = {'is_admin': True, 'is_super_admin': True} if args.super else {'is_admin': True}
+    else:
+        # Retirar --super conserva el rol de administrador; sin --super se retiran ambos
+        roles = {'is_super_admin': False} if args.super else {'is_admin': False, 'is_super_admin': False}
+    changed = set_roles(telegram_ids, **roles)
+    print(f"✅ {changed} usuarios actualizados", file=sys.stderr)
+    if changed < len(telegram_ids):
+        print(f"⚠️ {len(telegram_ids) - changed} Telegram IDs no corresponden a ningún usuario registrado", file=sys.stderr)
+
+
+def cmd_stats(args):
+    with database.get_engine().connect() as conn:
+        for name, model in MODELS.items():
+            total = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+            print(f"{name}: {total}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Administración de la base de datos del bot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta una tabla a CSV o JSONL")
+    export_parser.add_argument("table", choices=sorted(MODELS))
+    export_parser.add_argument("-o", "--output", help="Archivo de salida (por defecto, stdout)")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"])
+    export_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    export_parser.set_defaults(func=cmd_export)
+
+    import_parser = subparsers.add_parser("import", help="Importa filas desde CSV o JSONL")
+    import_parser.add_argument("table", choices=sorted(MODELS))
+    import_parser.add_argument("input", help="Archivo de entrada ('-' para stdin)")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"])
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    import_parser.add_argument("--keep-ids", action="store_true", help="Conserva la columna id del archivo")
+    import_parser.set_defaults(func=cmd_import)
+
+    roles_parser = subparsers.add_parser("roles", help="Concede o retira el rol de administrador")
+    roles_parser.add_argument("action", choices=["grant", "revoke"])
+    roles_parser.add_argument("telegram_ids", nargs="*")
+    roles_parser.add_argument("--super", action="store_true", help="Rol de superadministrador")
+    roles_parser.add_argument("--from-file", help="Archivo con un Telegram ID por línea")
+    roles_parser.set_defaults(func=cmd_roles)
+
+    stats_parser = subparsers.add_parser("stats", help="Muestra el número de filas de cada tabla")
+    stats_parser.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+    database.init_db()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+from sqlalchemy import event
+
+# Límites (en segundos) del histograma de latencia de los manejadores
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Contadores del manejador que se está ejecutando; run_db copia el contexto a los hilos
+_current = contextvars.ContextVar("handler_metrics", default=None)
+
+
+class _Call:
+    """Consultas hechas durante una ejecución de un manejador"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+class HandlerStats:
+    """Contadores acumulados de un manejador"""
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'max': self.max,
+            'queries': self.queries,
+            'db_time': self.db_time,
+        }
+
+
+class HandlerMetrics:
+    """Latencia, errores y consultas a la base de datos por manejador.
+
+    Los manejadores se envuelven con `instrument` (o todos a la vez con
+    `instrument_application`) y las consultas se atribuyen al manejador en
+    curso mediante los eventos de SQLAlchemy registrados con `watch_engine`.
+    Las consultas fuera de un manejador (trabajos periódicos, scripts) solo
+    cuentan en los totales.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, clock=time.perf_counter):
+        self.buckets = buckets
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.handlers = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+        self._last_summary = {}
+
+    def _stats(self, name):
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats(self.buckets)
+        return stats
+
+    def record(self, name, seconds, call, error=False):
+        with self._lock:
+            stats = self._stats(name)
+            stats.count += 1
+            stats.errors += error
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.queries += call.queries
+            stats.db_time += call.db_time
+            stats.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def record_query(self, seconds):
+        call = _current.get()
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += seconds
+            if call is not None:
+                call.queries += 1
+                call.db_time += seconds
+
+    ###########################################
+    # INSTRUMENTACIÓN
+    ###########################################
+
+    def instrument(self, name, callback):
+        """Envuelve una corrutina manejadora para medirla"""
+        if getattr(callback, "_instrumented", False):
+            return callback
+        # telegram solo se importa al instrumentar: database usa este módulo sin él
+        from telegram.ext import ApplicationHandlerStop
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            call = _Call()
+            token = _current.set(call)
+            start = self._clock()
+            error = False
+            try:
+                return await callback(update, context)
+            except ApplicationHandlerStop:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                _current.reset(token)
+                self.record(name, self._clock() - start, call, error)
+        wrapper._instrumented = True
+        return wrapper
+
+    def _instrument_handler(self, handler):
+        from telegram.ext import ConversationHandler
+
+        if isinstance(handler, ConversationHandler):
+            for child in handler.entry_points + handler.fallbacks:
+                self._instrument_handler(child)
+            for handlers in handler.states.values():
+                for child in handlers:
+                    self._instrument_handler(child)
+            return
+        # Los enrutadores (TextRouter) miden cada una de sus rutas por separado
+        owner = getattr(handler.callback, "__self__", None)
+        if hasattr(owner, "instrument"):
+            owner.instrument(self.instrument)
+            return
+        handler.callback = self.instrument(_handler_name(handler), handler.callback)
+
+    def instrument_application(self, application):
+        """Envuelve todos los manejadores ya registrados en la aplicación"""
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                self._instrument_handler(handler)
+
+    def watch_engine(self, engine):
+        """Cuenta las consultas del motor y su duración"""
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(self._clock())
+
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            self.record_query(self._clock() - conn.info["query_start"].pop())
+
+        def on_error(exception_context):
+            # Una consulta fallida no llega a after_cursor_execute
+            starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+            if starts:
+                self.record_query(self._clock() - starts.pop())
+
+        event.listen(engine, "before_cursor_execute", before_execute)
+        event.listen(engine, "after_cursor_execute", after_execute)
+        event.listen(engine, "handle_error", on_error)
+
+    ###########################################
+    # EXPOSICIÓN
+    ###########################################
+
+    def snapshot(self):
+        """Copia de los contadores por manejador y de los totales de base de datos"""
+        with self._lock:
+            return {
+                'handlers': {name: stats.as_dict() for name, stats in self.handlers.items()},
+                'db_queries': self.db_queries,
+                'db_time': self.db_time,
+            }
+
+    def summary(self):
+        """Resumen de lo ocurrido desde el resumen anterior, un manejador por línea"""
+        handlers = self.snapshot()['handlers']
+        lines = []
+        for name in sorted(handlers):
+            current = handlers[name]
+            previous = self._last_summary.get(name, {})
+            count = current['count'] - previous.get('count', 0)
+            if not count:
+                continue
+            total = current['total'] - previous.get('total', 0.0)
+            queries = current['queries'] - previous.get('queries', 0)
+            db_time = current['db_time'] - previous.get('db_time', 0.0)
+            lines.append(
+                f"{name}: {count} llamadas, {total / count * 1000:.1f} ms de media, "
+                f"{current['errors'] - previous.get('errors', 0)} errores, "
+                f"{queries / count:.1f} consultas y {db_time / count * 1000:.1f} ms de BD por llamada"
+            )
+        self._last_summary = handlers
+        return lines
+
+    def render_prometheus(self, pool=None):
+        """Métricas en el formato de texto de Prometheus; `pool` es un snapshot de PoolMetrics"""
+        with self._lock:
+            handlers = [(name, stats.as_dict(), list(stats.bucket_counts)) for name, stats in sorted(self.handlers.items())]
+            db_queries, db_time = self.db_queries, self.db_time
+
+        lines = [
+            "# TYPE bot_handler_latency_seconds histogram",
+        ]
+        for name, stats, bucket_counts in handlers:
+            cumulative = 0
+            for le, bucket_count in zip([*map(str, self.buckets), "+Inf"], bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'bot_handler_latency_seconds_bucket{{handler="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'bot_handler_latency_seconds_sum{{handler="{name}"}} {stats["total"]}')
+            lines.append(f'bot_handler_latency_seconds_count{{handler="{name}"}} {stats["count"]}')
+        for metric, key, kind in (
+            ("bot_handler_errors_total", "errors", "counter"),
+            ("bot_handler_db_queries_total", "queries", "counter"),
+            ("bot_handler_db_seconds_total", "db_time", "counter"),
+        ):
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f'{metric}{{handler="{name}"}} {stats[key]}' for name, stats, _ in handlers)
+        lines += [
+            "# TYPE bot_db_queries_total counter",
+            f"bot_db_queries_total {db_queries}",
+            "# TYPE bot_db_seconds_total counter",
+            f"bot_db_seconds_total {db_time}",
+        ]
+        if pool is not None:
+            lines.append("# TYPE bot_db_pool_wait_seconds histogram")
+            cumulative = 0
+            for le, bucket_count in pool['wait_buckets'].items():
+                cumulative += bucket_count
+                lines.append(f'bot_db_pool_wait_seconds_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"bot_db_pool_wait_seconds_sum {pool['wait_total']}")
+            lines.append(f"bot_db_pool_wait_seconds_count {pool['checkouts']}")
+        return "\n".join(lines) + "\n"
+
+
+def _handler_name(handler):
+    from telegram.ext import CommandHandler
+
+    name = getattr(handler.callback, "__name__", type(handler).__name__)
+    if name == "<lambda>" and isinstance(handler, CommandHandler):
+        return f"/{min(handler.commands)}"
+    return name
+
+
+metrics = HandlerMetrics()
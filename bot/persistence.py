@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import threading
+
+from sqlalchemy import Column, MetaData, String, Table, Text, delete, select, tuple_
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+persistence_metadata = MetaData()
+bot_state = Table(
+    "bot_state", persistence_metadata,
+    Column("kind", String(100), primary_key=True),
+    Column("key", String(100), primary_key=True),
+    Column("data", Text, nullable=False)
+)
+
+# Valor que marca una fila pendiente de borrar
+_DELETE = None
+
+
+class SQLPersistence(BasePersistence):
+    """Persistencia de user_data, chat_data, bot_data y conversaciones en la base de datos.
+
+    Las escrituras no se hacen por actualización: la aplicación entrega los
+    cambios cada `update_interval` segundos, aquí se acumulan y se guardan
+    todos juntos en una sola transacción tras `flush_delay` segundos. Al
+    arrancar cada tipo de dato se carga con una única consulta.
+    Los datos de callback (arbitrary_callback_data) no se persisten.
+    """
+
+    def __init__(self, engine, update_interval=5.0, flush_delay=0.5, store_data=None):
+        super().__init__(
+            store_data=store_data or PersistenceInput(callback_data=False),
+            update_interval=update_interval
+        )
+        self.engine = engine
+        self.flush_delay = flush_delay
+        self._pending = {}
+        self._flush_task = None
+        self._table_ready = False
+        # Los lotes se escriben en orden aunque se solapen dos hilos
+        self._write_lock = threading.Lock()
+
+    # Lectura
+
+    def _load(self, kind):
+        if not self._table_ready:
+            persistence_metadata.create_all(self.engine)
+            self._table_ready = True
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(bot_state.c.key, bot_state.c.data).where(bot_state.c.kind == kind))
+            return {row.key: json.loads(row.data) for row in rows}
+
+    async def _load_async(self, kind):
+        return await asyncio.to_thread(self._load, kind)
+
+    async def get_user_data(self):
+        rows = await self._load_async("user_data")
+        return {int(key): data for key, data in rows.items()}
+
+    async def get_chat_data(self):
+        rows = await self._load_async("chat_data")
+        return {int(key): data for key, data in rows.items()}
+
+    async def get_bot_data(self):
+        rows = await self._load_async("bot_data")
+        return rows.get("", {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await self._load_async(f"conversation:{name}")
+        return {tuple(json.loads(key)): state for key, state in rows.items()}
+
+    # Escritura
+
+    def _stage(self, kind, key, data):
+        self._pending[(kind, str(key))] = _DELETE if data is _DELETE else json.dumps(data)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Los cambios que llegan mientras se escribe un lote ven esta tarea aún
+        # en marcha y no programan otra: se guardan en la siguiente vuelta
+        while self._pending:
+            await asyncio.sleep(self.flush_delay)
+            await self._write_pending()
+
+    async def _write_pending(self):
+        batch, self._pending = self._pending, {}
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch):
+        """Guarda un lote de cambios en una sola transacción"""
+        deletes = [key for key, data in batch.items() if data is _DELETE]
+        upserts = [
+            {"kind": kind, "key": key, "data": data}
+            for (kind, key), data in batch.items() if data is not _DELETE
+        ]
+        with self._write_lock, self.engine.begin() as conn:
+            # Se borran también las filas que se van a reescribir: así el lote
+            # funciona igual en SQLite y PostgreSQL sin depender de UPSERT.
+            keys = deletes + [(row["kind"], row["key"]) for row in upserts]
+            if keys:
+                conn.execute(delete(bot_state).where(tuple_(bot_state.c.kind, bot_state.c.key).in_(keys)))
+            if upserts:
+                conn.execute(bot_state.insert(), upserts)
+        logger.debug("Persistencia: %d filas guardadas, %d borradas", len(upserts), len(deletes))
+
+    async def update_user_data(self, user_id, data):
+        self._stage("user_data", user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._stage("chat_data", chat_id, data)
+
+    async def update_bot_data(self, data):
+        self._stage("bot_data", "", data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        self._stage(f"conversation:{name}", json.dumps(list(key)), new_state)
+
+    async def drop_user_data(self, user_id):
+        self._stage("user_data", user_id, _DELETE)
+
+    async def drop_chat_data(self, chat_id):
+        self._stage("chat_data", chat_id, _DELETE)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """Guarda inmediatamente todos los cambios pendientes (al detener el bot)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        await self._write_pending()
@@ -0,0 +1,37 @@
+import asyncio
+
+# Las llamadas a la Bot API de una respuesta se lanzan a la vez salvo las que
+# el usuario ve en un orden concreto (dos mensajes seguidos al mismo chat).
+# Con el pool de conexiones de la aplicación cada llamada va por su propia
+# conexión (o su propio stream con HTTP/2), así que una respuesta tarda lo
+# que su cadena ordenada más larga y no la suma de todas sus llamadas.
+
+
+async def in_order(*calls):
+    """Ejecuta las corrutinas una detrás de otra y devuelve sus resultados.
+
+    Si una falla, las siguientes no llegan a ejecutarse.
+    """
+    results = []
+    pending = iter(calls)
+    try:
+        for call in pending:
+            results.append(await call)
+    finally:
+        for call in pending:
+            call.close()
+    return results
+
+
+async def together(*calls):
+    """Ejecuta a la vez corrutinas independientes y devuelve sus resultados.
+
+    Espera a que terminen todas aunque alguna falle, y después relanza el
+    primer error: que falle, por ejemplo, el borrado de un mensaje antiguo no
+    deja a medias el envío de los demás.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
@@ -0,0 +1,61 @@
+import threading
+import time
+
+
+class RoleService:
+    """Roles de administración en memoria para comprobar permisos sin consultas.
+
+    `load_roles()` devuelve dos iterables con los telegram_id de los
+    administradores y de los superadministradores guardados en la base de
+    datos. Los conjuntos se sustituyen enteros en cada recarga, así que las
+    comprobaciones son O(1) y no necesitan bloqueo. Los IDs estáticos (de la
+    configuración) siempre tienen el rol, estén o no en la base de datos.
+    Las recargas las hace un trabajo periódico (ROLE_REFRESH_INTERVAL) o quien
+    cambia los roles: comprobar un permiso nunca consulta la base de datos,
+    salvo la primera vez si aún no se han cargado.
+    """
+
+    def __init__(self, load_roles, static_admins=(), static_super_admins=(), clock=time.monotonic):
+        self._load_roles = load_roles
+        self.static_admins = frozenset(static_admins)
+        self.static_super_admins = frozenset(static_super_admins)
+        self._clock = clock
+        self._admins = self.static_admins | self.static_super_admins
+        self._super_admins = self.static_super_admins
+        self._loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def refresh(self):
+        """Recarga los roles desde la base de datos (llamar fuera del bucle de eventos)"""
+        with self._refresh_lock:
+            admins, super_admins = self._load_roles()
+            super_admins = frozenset(super_admins) | self.static_super_admins
+            self._admins = frozenset(admins) | self.static_admins | super_admins
+            self._super_admins = super_admins
+            self._loaded_at = self._clock()
+
+    def _ensure_loaded(self):
+        # Primera comprobación antes de la carga inicial (p. ej. en scripts)
+        if self._loaded_at is None:
+            self.refresh()
+
+    def is_admin(self, telegram_id):
+        """Administrador o superadministrador"""
+        self._ensure_loaded()
+        return telegram_id in self._admins
+
+    def is_super_admin(self, telegram_id):
+        self._ensure_loaded()
+        return telegram_id in self._super_admins
+
+    def admin_ids(self):
+        self._ensure_loaded()
+        return self._admins
+
+    def super_admin_ids(self):
+        self._ensure_loaded()
+        return self._super_admins
@@ -0,0 +1,87 @@
+import re
+import unicodedata
+
+from telegram.ext import ApplicationHandlerStop, MessageHandler, filters
+
+
+# Todo lo que no sea letra, número o espacio: emojis, selectores de variante, signos...
+_NON_WORD = re.compile(r"[^\w\s]|_")
+
+
+def normalize_label(text):
+    """Normaliza el texto de un botón: sin emojis ni signos, espacios simples y sin mayúsculas"""
+    text = _NON_WORD.sub("", unicodedata.normalize("NFC", text))
+    return " ".join(text.split()).casefold()
+
+
+class _RouteFilter(filters.MessageFilter):
+    """Deja pasar solo los mensajes cuyo texto es la etiqueta de un botón"""
+
+    def __init__(self, router):
+        super().__init__(name="TextRouter")
+        self.router = router
+
+    def filter(self, message):
+        return message.text is not None and self.router.resolve(message.text) is not None
+
+
+class TextRouter:
+    """Enruta los botones del teclado a sus manejadores con una búsqueda en diccionario.
+
+    Solo coinciden las etiquetas exactas (tras normalizar), de modo que el
+    texto libre nunca dispara un botón por contener una palabra parecida.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._routes = {}
+        self._max_length = 0
+
+    def add(self, label, callback):
+        """Asocia la etiqueta de un botón a una corrutina manejadora"""
+        key = normalize_label(label)
+        if not key:
+            raise ValueError(f"La etiqueta {label!r} no contiene texto")
+        self._exact[label] = callback
+        self._routes[key] = callback
+        self._max_length = max(self._max_length, len(label))
+
+    def route(self, *labels):
+        """Decorador para registrar un manejador para una o varias etiquetas"""
+        def decorator(callback):
+            for label in labels:
+                self.add(label, callback)
+            return callback
+        return decorator
+
+    def instrument(self, wrap):
+        """Sustituye cada manejador por `wrap(nombre, manejador)`, p. ej. para medirlo"""
+        wrapped = {}
+        for table in (self._exact, self._routes):
+            for key, callback in table.items():
+                if callback not in wrapped:
+                    wrapped[callback] = wrap(callback.__name__, callback)
+                table[key] = wrapped[callback]
+
+    def resolve(self, text):
+        """Devuelve el manejador de un texto, o None si no es un botón"""
+        # Las pulsaciones de botones llegan con la etiqueta exacta
+        callback = self._exact.get(text)
+        if callback is not None:
+            return callback
+        # Los mensajes mucho más largos que cualquier etiqueta se descartan sin normalizar
+        if len(text) > self._max_length * 2:
+            return None
+        return self._routes.get(normalize_label(text))
+
+    async def dispatch(self, update, context):
+        """Ejecuta el manejador del botón y detiene el resto de grupos de manejadores"""
+        callback = self.resolve(update.message.text)
+        if callback is None:
+            return
+        await callback(update, context)
+        raise ApplicationHandlerStop
+
+    def build_handler(self):
+        """Crea el MessageHandler que solo atiende etiquetas de botones"""
+        return MessageHandler(filters.TEXT & ~filters.COMMAND & _RouteFilter(self), self.dispatch)
@@ -0,0 +1,129 @@
+import bisect
+import datetime
+
+from cache import TTLCache, MISSING
+
+# Horario de atención anunciado en "Contacto": lunes a viernes 10-19, sábados 10-14.
+# Formato: "<días>=<apertura>-<cierre>" separados por ';' (0 = lunes, 6 = domingo).
+DEFAULT_OPENING_HOURS = "0-4=10:00-19:00;5=10:00-14:00"
+
+
+def _parse_time(value):
+    hours, minutes = value.strip().split(":")
+    return datetime.time(int(hours), int(minutes))
+
+
+class Schedule:
+    """Horario semanal de citas dividido en franjas de duración fija"""
+
+    def __init__(self, opening_hours, slot_minutes=30, capacity=1):
+        if slot_minutes <= 0:
+            raise ValueError("La duración de la franja debe ser positiva")
+        if capacity <= 0:
+            raise ValueError("La capacidad de la franja debe ser positiva")
+        self.opening_hours = opening_hours
+        self.slot_minutes = slot_minutes
+        self.slot_length = datetime.timedelta(minutes=slot_minutes)
+        self.capacity = capacity
+        # Inicio de cada franja como desplazamiento desde medianoche, por día de la semana
+        self._offsets = {weekday: self._compute_offsets(ranges) for weekday, ranges in opening_hours.items()}
+
+    @classmethod
+    def from_string(cls, spec, slot_minutes=30, capacity=1):
+        """Construye un horario a partir de una cadena como DEFAULT_OPENING_HOURS"""
+        opening_hours = {}
+        for part in filter(None, (p.strip() for p in spec.split(";"))):
+            days, hours = part.split("=")
+            first, _, last = days.partition("-")
+            opening, closing = hours.split("-")
+            for weekday in range(int(first), int(last or first) + 1):
+                opening_hours.setdefault(weekday, []).append((_parse_time(opening), _parse_time(closing)))
+        return cls(opening_hours, slot_minutes, capacity)
+
+    def _compute_offsets(self, ranges):
+        offsets = []
+        for opening, closing in sorted(ranges):
+            current = datetime.timedelta(hours=opening.hour, minutes=opening.minute)
+            end = datetime.timedelta(hours=closing.hour, minutes=closing.minute)
+            while current + self.slot_length <= end:
+                offsets.append(current)
+                current += self.slot_length
+        return offsets
+
+    def slots_for_day(self, day):
+        """Devuelve el inicio de todas las franjas de un día, ordenadas"""
+        midnight = datetime.datetime.combine(day, datetime.time())
+        return [midnight + offset for offset in self._offsets.get(day.weekday(), [])]
+
+    def is_slot_start(self, moment):
+        """Indica si una fecha coincide exactamente con el inicio de una franja"""
+        offset = moment - datetime.datetime.combine(moment.date(), datetime.time())
+        offsets = self._offsets.get(moment.weekday(), [])
+        position = bisect.bisect_left(offsets, offset)
+        return position < len(offsets) and offsets[position] == offset
+
+    def slot_containing(self, moment):
+        """Devuelve el inicio de la franja que contiene una fecha, o None"""
+        offset = moment - datetime.datetime.combine(moment.date(), datetime.time())
+        offsets = self._offsets.get(moment.weekday(), [])
+        position = bisect.bisect_right(offsets, offset) - 1
+        if position < 0 or offset >= offsets[position] + self.slot_length:
+            return None
+        return datetime.datetime.combine(moment.date(), datetime.time()) + offsets[position]
+
+
+class DaySlots:
+    """Franjas de un día con su ocupación, ordenadas para búsquedas por rango"""
+
+    def __init__(self, starts, booked):
+        self.starts = starts
+        self.booked = booked
+
+    def free_between(self, start, end, capacity):
+        """Franjas con hueco cuyo inicio cae en [start, end)"""
+        first = bisect.bisect_left(self.starts, start)
+        last = bisect.bisect_left(self.starts, end)
+        return [slot for slot in self.starts[first:last] if self.booked.get(slot, 0) < capacity]
+
+
+class SlotIndex:
+    """Índice en memoria de franjas libres, cargado por días desde la base de datos.
+
+    `load_booked(day_start, day_end)` debe devolver las fechas de las citas
+    activas del intervalo. Cada día se carga con una sola consulta y se
+    mantiene en caché hasta que expira o se invalida tras una reserva.
+    """
+
+    def __init__(self, schedule, load_booked, ttl=30.0, maxsize=366):
+        self.schedule = schedule
+        self._load_booked = load_booked
+        self._days = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _day(self, day):
+        cached = self._days.get(day)
+        if cached is not MISSING:
+            return cached
+        starts = self.schedule.slots_for_day(day)
+        booked = {}
+        if starts:
+            day_start = datetime.datetime.combine(day, datetime.time())
+            for moment in self._load_booked(day_start, day_start + datetime.timedelta(days=1)):
+                slot = self.schedule.slot_containing(moment)
+                if slot is not None:
+                    booked[slot] = booked.get(slot, 0) + 1
+        day_slots = DaySlots(starts, booked)
+        self._days.set(day, day_slots)
+        return day_slots
+
+    def free_slots(self, start, end):
+        """Devuelve los inicios de franja con hueco entre `start` y `end`"""
+        free = []
+        day = start.date()
+        while datetime.datetime.combine(day, datetime.time()) < end:
+            free.extend(self._day(day).free_between(start, end, self.schedule.capacity))
+            day += datetime.timedelta(days=1)
+        return free
+
+    def invalidate(self, moment):
+        """Descarta la ocupación cacheada del día de una fecha"""
+        self._days.invalidate(moment.date())
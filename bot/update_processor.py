@@ -0,0 +1,75 @@
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+# Actualizaciones admitidas a la vez (en ejecución o esperando su turno en su chat)
+DEFAULT_MAX_PENDING = 4096
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+def chat_key(update):
+    """Clave con la que se ordenan las actualizaciones: el chat, o el usuario si no hay chat"""
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return ("user", user.id)
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Procesa en paralelo las actualizaciones de chats distintos y en orden las de un mismo chat.
+
+    ConversationHandler necesita que las actualizaciones de una conversación
+    lleguen de una en una; con este procesador eso se cumple por chat y el
+    resto de chats no espera. Como mucho `max_running` actualizaciones se
+    ejecutan a la vez; las que esperan su turno en un chat ocupado no ocupan
+    plaza de ejecución, así que un chat con muchas actualizaciones seguidas no
+    frena a los demás. `max_concurrent_updates` solo limita cuántas se admiten
+    en total (en ejecución o esperando).
+    """
+
+    def __init__(self, max_running, max_concurrent_updates=None):
+        super().__init__(max_concurrent_updates or max(DEFAULT_MAX_PENDING, max_running))
+        if max_running < 1:
+            raise ValueError("max_running debe ser un entero positivo")
+        self.max_running = max_running
+        self._running = asyncio.Semaphore(max_running)
+        self._chats = {}
+
+    async def do_process_update(self, update, coroutine):
+        key = chat_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        # La cola del chat se toma sin ceder el control antes: las tareas de
+        # la aplicación empiezan en el orden en que llegaron las actualizaciones
+        # y asyncio.Lock despierta a los que esperan en el mismo orden.
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = self._chats[key] = _ChatQueue()
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._chats[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
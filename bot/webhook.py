@@ -0,0 +1,81 @@
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# Cabecera con la que Telegram firma las peticiones al webhook
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(application, webhook_path="/telegram", webhook_url=None,
+                       secret_token=None, allowed_updates=None, drop_pending_updates=False,
+                       metrics_text=None):
+    """Crea una aplicación ASGI que recibe las actualizaciones de Telegram por HTTP.
+
+    El ciclo de vida de la aplicación de Telegram (initialize/start/stop)
+    queda ligado al del servidor ASGI. Si se indica `webhook_url`, el webhook
+    se registra en Telegram al arrancar. Si se indica `metrics_text`, su
+    resultado se sirve en /metrics para Prometheus.
+    """
+
+    @asynccontextmanager
+    async def lifespan(api):
+        async with application:
+            # run_polling/run_webhook llaman a estos ganchos; aquí hay que hacerlo a mano
+            if application.post_init:
+                await application.post_init(application)
+            if webhook_url:
+                await application.bot.set_webhook(
+                    url=webhook_url,
+                    allowed_updates=allowed_updates,
+                    secret_token=secret_token,
+                    drop_pending_updates=drop_pending_updates
+                )
+                logger.info("Webhook registrado en %s", webhook_url)
+            await application.start()
+            try:
+                yield
+            finally:
+                await application.stop()
+                if application.post_stop:
+                    await application.post_stop(application)
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+    api = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+    api.state.application = application
+
+    @api.post(webhook_path)
+    async def telegram_webhook(request: Request):
+        if secret_token and request.headers.get(SECRET_TOKEN_HEADER) != secret_token:
+            return Response(status_code=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return Response(status_code=400)
+        # Se encola y se responde enseguida: Telegram no espera al procesamiento
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return Response(status_code=200)
+
+    @api.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    if metrics_text is not None:
+        @api.get("/metrics")
+        async def prometheus_metrics():
+            return PlainTextResponse(metrics_text(), media_type="text/plain; version=0.0.4")
+
+    return api
+
+
+def run_webhook(application, listen="0.0.0.0", port=8443, **webhook_options):
+    """Arranca el servidor uvicorn con el webhook (bloquea hasta que se detiene)"""
+    import uvicorn
+
+    api = create_webhook_app(application, **webhook_options)
+    uvicorn.run(api, host=listen, port=port, log_level="warning")
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del bot se importan por su nombre, igual que al ejecutar bot/bot_main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
+
+import config  # noqa: E402
+
+
+def _reset(database):
+    """Cierra el motor y vacía los componentes creados con la configuración anterior"""
+    database.dispose_engine()
+    for value in vars(database).values():
+        if getattr(value, "__module__", None) == database.__name__ and hasattr(value, "cache_clear"):
+            value.cache_clear()
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """Configura una base de datos SQLite en un archivo temporal y devuelve el módulo database.
+
+    Las variables que se pasan sustituyen al entorno real (ni .env.local ni
+    os.environ se leen).
+    """
+    import database
+
+    def configure(**environ):
+        config.configure(config.Settings({"DATABASE_URL": f"sqlite:///{tmp_path / 'bot.sqlite'}", **environ}))
+        _reset(database)
+        database.init_db()
+        return database
+
+    yield configure
+    _reset(database)
+    config.configure(None)
@@ -0,0 +1,69 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+# Lunes a las 10:00: inicio de franja con el horario por defecto
+SLOT = datetime.datetime(2030, 1, 7, 10, 0)
+BOOKINGS = 60
+
+
+def _book_concurrently(database, user_ids, date):
+    """Lanza todas las reservas a la vez desde hilos distintos y devuelve sus resultados"""
+    barrier = threading.Barrier(len(user_ids))
+
+    def book(user_id):
+        barrier.wait()
+        return database.book_appointment(user_id, date)
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as executor:
+        return list(executor.map(book, user_ids))
+
+
+def _create_users(database, count):
+    for i in range(count):
+        database.save_user(5000 + i, f"Usuario {i}", "600000000", f"u{i}@example.com", "Calle 1")
+    return [database.get_user(5000 + i)['id'] for i in range(count)]
+
+
+def _active_bookings(database, date):
+    with database.get_engine().connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(database.Appointment.__table__)
+            .where(database.Appointment.date == date)
+            .where(database.Appointment.status.in_(database.ACTIVE_APPOINTMENT_STATUSES))
+        ).scalar()
+
+
+def test_concurrent_bookings_never_exceed_capacity(make_database):
+    capacity = 3
+    database = make_database(APPOINTMENT_SLOT_CAPACITY=str(capacity))
+    user_ids = _create_users(database, BOOKINGS)
+
+    results = _book_concurrently(database, user_ids, SLOT)
+
+    booked = [appointment_id for appointment_id in results if appointment_id is not None]
+    assert len(booked) == capacity
+    assert len(set(booked)) == capacity
+    assert _active_bookings(database, SLOT) == capacity
+    # La franja ya no aparece como libre
+    assert SLOT not in database.get_free_slots(SLOT, SLOT + datetime.timedelta(hours=1))
+
+
+def test_full_slot_rejects_later_bookings(make_database):
+    database = make_database(APPOINTMENT_SLOT_CAPACITY="1")
+    first, second = _create_users(database, 2)
+
+    assert database.book_appointment(first, SLOT) is not None
+    assert database.book_appointment(second, SLOT) is None
+    # La franja siguiente no se ve afectada
+    assert database.book_appointment(second, SLOT + datetime.timedelta(minutes=30)) is not None
+
+
+def test_booking_outside_a_slot_start_is_rejected(make_database):
+    database = make_database()
+    (user_id,) = _create_users(database, 1)
+
+    assert database.book_appointment(user_id, SLOT + datetime.timedelta(minutes=10)) is None
+    assert database.book_appointment(user_id, datetime.datetime(2030, 1, 6, 10, 0)) is None  # domingo
@@ -0,0 +1,103 @@
+import asyncio
+import collections
+
+import pytest
+from telegram import Bot
+
+USERS = 7
+FIRST_TELEGRAM_ID = 9000
+
+
+class _Interrupted(Exception):
+    """Simula que el proceso se detiene justo después de guardar un punto de control"""
+
+
+class _RateLimitedOnce:
+    """error_hook que responde con un 429 al primer envío a cada chat de `chat_ids`"""
+
+    def __init__(self, chat_ids):
+        self.pending = set(chat_ids)
+        self.rejected = collections.Counter()
+
+    def __call__(self, method, params):
+        from fake_telegram import too_many_requests
+
+        chat_id = params.get("chat_id")
+        if method == "sendMessage" and chat_id in self.pending:
+            self.pending.discard(chat_id)
+            self.rejected[chat_id] += 1
+            return too_many_requests(retry_after=1)
+        return None
+
+
+def _delivered(request):
+    """Mensajes entregados por chat, sin contar los intentos rechazados con 429"""
+    attempts = collections.Counter(params["chat_id"] for params in request.calls_to("sendMessage"))
+    return attempts - request.error_hook.rejected
+
+
+@pytest.fixture
+def database(make_database):
+    database = make_database(BROADCAST_RATE="1000")
+    for i in range(USERS):
+        telegram_id = FIRST_TELEGRAM_ID + i
+        database.save_user(telegram_id, f"Usuario {i}", "600000000", f"u{i}@example.com", "Calle 1")
+    return database
+
+
+def _run(request, scenario):
+    async def main():
+        async with Bot("1:fake", request=request) as bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+
+def test_broadcast_retries_429_and_sends_once_per_user(database):
+    import handlers
+    from fake_telegram import FakeBotRequest
+
+    limited = {FIRST_TELEGRAM_ID + 1, FIRST_TELEGRAM_ID + 4}
+    request = FakeBotRequest(error_hook=_RateLimitedOnce(limited))
+    broadcast_id = database.create_broadcast("Rebajas", created_by=1)
+    broadcast = {'id': broadcast_id, 'text': "Rebajas", 'last_user_id': 0, 'sent': 0, 'failed': 0}
+
+    stats = _run(request, lambda bot: handlers.deliver_broadcast(bot, broadcast))
+
+    # Los 429 se reintentan: cada usuario recibe un único mensaje
+    assert request.error_hook.rejected == {chat_id: 1 for chat_id in limited}
+    assert _delivered(request) == {FIRST_TELEGRAM_ID + i: 1 for i in range(USERS)}
+    assert (stats.sent, stats.failed, stats.retries) == (USERS, 0, len(limited))
+    assert database.get_unfinished_broadcasts() == []
+
+
+def test_stopped_broadcast_resumes_from_checkpoint(database):
+    import handlers
+    from broadcast import run_broadcast
+    from fake_telegram import FakeBotRequest
+
+    request = FakeBotRequest(error_hook=_RateLimitedOnce({FIRST_TELEGRAM_ID + 5}))
+    broadcast_id = database.create_broadcast("Novedades", created_by=1)
+
+    async def fetch_recipients(after_id, limit):
+        return await database.run_db(database.get_user_chunk, after_id, limit)
+
+    async def save_and_stop(stats):
+        await database.run_db(database.save_broadcast_progress, broadcast_id, stats.last_user_id, stats.sent,
+                              stats.failed)
+        raise _Interrupted
+
+    # Primera ejecución: se detiene tras el primer bloque de 3 usuarios
+    with pytest.raises(_Interrupted):
+        _run(request, lambda bot: run_broadcast(bot, "Novedades", fetch_recipients, save_and_stop,
+                                                chunk_size=3, global_rate=1000))
+    assert sum(_delivered(request).values()) == 3
+
+    # Al arrancar de nuevo se reanuda desde el punto de control guardado
+    unfinished = database.get_unfinished_broadcasts()
+    assert [(b['id'], b['sent']) for b in unfinished] == [(broadcast_id, 3)]
+    stats = _run(request, lambda bot: handlers.deliver_broadcast(bot, unfinished[0]))
+
+    assert request.error_hook.rejected == {FIRST_TELEGRAM_ID + 5: 1}
+    assert _delivered(request) == {FIRST_TELEGRAM_ID + i: 1 for i in range(USERS)}
+    assert (stats.sent, stats.failed) == (USERS, 0)
+    assert database.get_unfinished_broadcasts() == []
@@ -0,0 +1,9 @@
+def test_engine_uses_configured_settings(make_database):
+    database = make_database(DB_POOL_SIZE="3", DB_MAX_OVERFLOW="1", SQLITE_BUSY_TIMEOUT_MS="1234", SQLITE_CACHE_KB="512")
+    engine = database.get_engine()
+
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 1
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -512
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+
+class _Bot:
+    """Bot de prueba: cada foto subida (lo que no es un file_id) recibe un file_id nuevo"""
+
+    def __init__(self):
+        self.uploads = 0
+        self.sent = []
+
+    def _message(self, content):
+        if not isinstance(content, str):
+            self.uploads += 1
+            content = f"file-{self.uploads}"
+        self.sent.append(content)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=content)])
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        return self._message(photo)
+
+    async def send_media_group(self, chat_id, media):
+        return [self._message(item.media) for item in media]
+
+
+def _png(color):
+    output = io.BytesIO()
+    Image.new("RGB", (40, 30), color).save(output, "PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def catalog(make_database, tmp_path):
+    import handlers
+
+    database = make_database(THUMBNAIL_DIR=str(tmp_path / "thumbnails"))
+    handlers.get_thumbnail_store.cache_clear()
+    sources = {"https://img/1.png": _png("red"), "https://img/2.png": _png("blue")}
+    for i, url in enumerate(sources):
+        database.add_product(f"Camisa {i}", None, 20.0, url, "camisas", 1)
+    products = database.get_products("camisas")
+
+    store = handlers.get_thumbnail_store()
+    results = asyncio.run(handlers.generate_thumbnails(
+        database.get_pending_images(), store, sources.__getitem__, handlers.get_image_executor()
+    ))
+    database.save_product_images(results)
+    yield SimpleNamespace(database=database, handlers=handlers, store=store, products=products)
+    handlers.get_thumbnail_store.cache_clear()
+
+
+def test_second_send_reuses_file_ids(catalog):
+    bot = _Bot()
+    assert asyncio.run(catalog.handlers.send_product_photos(bot, 1, catalog.products)) == 2
+    assert bot.uploads == 2
+
+    assert asyncio.run(catalog.handlers.send_product_photos(bot, 1, catalog.products)) == 2
+    assert bot.uploads == 2
+
+
+def test_missing_thumbnail_is_skipped_and_queued_again(catalog):
+    lost, kept = catalog.products
+    key = catalog.database.get_product_images([lost['id']])[lost['id']][0]
+    os.remove(catalog.store.path(key))
+
+    bot = _Bot()
+    assert asyncio.run(catalog.handlers.send_product_photos(bot, 1, catalog.products)) == 1
+    assert bot.uploads == 1
+    # La miniatura perdida vuelve a la cola del proceso de miniaturas
+    assert catalog.database.get_pending_images() == [(lost['id'], lost['image_url'])]
+    assert kept['id'] in catalog.database.get_product_images([kept['id']])
+
+
+def test_failed_download_is_retried_with_backoff(catalog):
+    database, handlers = catalog.database, catalog.handlers
+    url = "https://img/caida.png"
+    database.add_product("Camisa rota", None, 20.0, url, "camisas", 1)
+    attempts = []
+
+    def fetch(source):
+        attempts.append(source)
+        if len(attempts) < 3:
+            raise OSError("503 Service Unavailable")
+        return _png("green")
+
+    def process():
+        pending = database.get_pending_images()
+        results = asyncio.run(handlers.generate_thumbnails(pending, catalog.store, fetch, handlers.get_image_executor()))
+        database.save_product_images(results)
+        return pending
+
+    def retry_state():
+        session = database.get_session()
+        try:
+            image = (
+                session.query(database.ProductImage)
+                .join(database.Product)
+                .filter(database.Product.image_url == url)
+                .one()
+            )
+            delay = image.retry_at and (image.retry_at - image.updated_at).total_seconds()
+            return image.thumbnail_key, image.failures, delay
+        finally:
+            session.close()
+
+    def make_due():
+        session = database.get_session()
+        try:
+            session.query(database.ProductImage).filter(database.ProductImage.thumbnail_key.is_(None)).update(
+                {'retry_at': database.datetime.datetime.utcnow()}
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    # Primer fallo: no se reintenta hasta que pase la espera
+    assert len(process()) == 1
+    assert retry_state() == (None, 1, 300)
+    assert database.get_pending_images() == []
+
+    # Cada fallo seguido dobla la espera
+    make_due()
+    assert len(process()) == 1
+    assert retry_state() == (None, 2, 600)
+
+    # Al tercer intento la descarga funciona y se olvidan los fallos
+    make_due()
+    assert len(process()) == 1
+    key, failures, delay = retry_state()
+    assert key and (failures, delay) == (0, None)
+    assert attempts == [url] * 3
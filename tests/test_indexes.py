@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+
+def _query_plans(database, call):
+    """Ejecuta `call` y devuelve el plan de SQLite de cada SELECT que lanza"""
+    engine = database.get_engine()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert statements, "la función no lanzó ninguna consulta"
+    with engine.connect() as conn:
+        return [
+            "\n".join(row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in statements
+        ]
+
+
+@pytest.fixture
+def database(make_database):
+    database = make_database()
+    database.save_user(1001, "Ana", "600000000", "ana@example.com", "Calle 1")
+    database.add_product("Camisa", "Lino", 30.0, None, "camisas", 5)
+    return database
+
+
+def _assert_uses_indexes(plans, *index_names):
+    plan = "\n".join(plans)
+    for index_name in index_names:
+        assert index_name in plan, plan
+    assert "SCAN" not in plan, plan
+
+
+def test_user_lookup_uses_telegram_id_index(database):
+    plans = _query_plans(database, lambda: database.get_user(2002))
+    # Índice de la restricción UNIQUE de telegram_id
+    _assert_uses_indexes(plans, "sqlite_autoindex_users_1")
+
+
+def test_product_filter_uses_category_index(database):
+    plans = _query_plans(database, lambda: database.get_products("camisas", after_id=0, limit=20))
+    _assert_uses_indexes(plans, "ix_products_category_id")
+
+
+def test_user_appointments_by_date_use_user_date_index(database):
+    now = datetime.datetime(2030, 1, 7, 10, 0)
+    plans = _query_plans(
+        database, lambda: database.get_user_appointments(1001, start=now, end=now + datetime.timedelta(days=7))
+    )
+    _assert_uses_indexes(plans, "sqlite_autoindex_users_1", "ix_appointments_user_id_date")
+
+
+def test_booked_slots_by_date_use_status_date_index(database):
+    start = datetime.datetime(2030, 1, 7)
+    plans = _query_plans(database, lambda: database._load_booked_dates(start, start + datetime.timedelta(days=1)))
+    _assert_uses_indexes(plans, "ix_appointments_status_date")
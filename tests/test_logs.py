@@ -0,0 +1,75 @@
+import io
+import json
+import logging
+
+import pytest
+
+import logs
+
+TOKEN = "123456789:AAHdqTcvCH1vGWJxfSeofSAs0K5PALDsaw"
+
+
+@pytest.fixture
+def capture():
+    """Configura el log con la cola y devuelve una función que lo detiene y devuelve la salida"""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    output = io.StringIO()
+
+    def setup(**options):
+        logs.setup_logging(level=logging.DEBUG, stream=output, **options)
+
+    def read():
+        logs.stop_logging()
+        return output.getvalue()
+
+    yield setup, read
+    logs.stop_logging()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def _log_failure(logger):
+    try:
+        raise RuntimeError(f"No se pudo avisar a juan@example.com (+34 612 345 678) con {TOKEN}")
+    except RuntimeError:
+        logger.exception("Fallo al enviar")
+
+
+@pytest.mark.parametrize("json_output", [False, True])
+def test_tracebacks_are_redacted(capture, json_output):
+    setup, read = capture
+    setup(json_output=json_output, text_format=logging.BASIC_FORMAT)
+
+    _log_failure(logging.getLogger("tests.logs"))
+
+    output = read()
+    assert "RuntimeError" in output
+    for secret in ("juan@example.com", "612 345 678", TOKEN):
+        assert secret not in output
+    assert "j***@example.com" in output and "[token]" in output
+
+
+def test_pii_fields_are_masked_in_json(capture):
+    setup, read = capture
+    setup()
+
+    logging.getLogger("handlers").info("Registro de %s", 1, extra={"phone": "+34 612 345 678", "email": "ana@x.es"})
+
+    (entry,) = [json.loads(line) for line in read().splitlines()]
+    assert entry["msg"] == "Registro de 1"
+    assert entry["phone"] == "***78"
+    assert entry["email"] == "a***@x.es"
+
+
+def test_rate_limit_drops_info_but_keeps_warnings(capture):
+    setup, read = capture
+    setup(rate_limits={"httpx": 2})
+    logger = logging.getLogger("httpx.client")
+
+    for i in range(10):
+        logger.info("petición %d", i)
+    logger.warning("aviso")
+
+    entries = [json.loads(line) for line in read().splitlines()]
+    assert [entry["msg"] for entry in entries] == ["petición 0", "petición 1", "aviso"]
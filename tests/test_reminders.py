@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import Forbidden, NetworkError
+
+
+class _Bot:
+    """Bot de prueba: los chats de `blocked` bloquearon el bot y la red falla para los de `offline`"""
+
+    def __init__(self, blocked=(), offline=()):
+        self.blocked = set(blocked)
+        self.offline = set(offline)
+        self.attempts = 0
+
+    async def send_message(self, chat_id, text):
+        self.attempts += 1
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        if chat_id in self.offline:
+            raise NetworkError("sin conexión")
+
+
+@pytest.fixture
+def reminders(make_database, monkeypatch):
+    import handlers
+
+    database = make_database(REMINDER_BATCH_SIZE="5")
+    monkeypatch.setattr(handlers, "reminder_stats", dict(handlers.reminder_stats, runs=0, sent=0, failed=0, retried=0,
+                                                         max_lag_seconds=0.0))
+    return SimpleNamespace(database=database, handlers=handlers)
+
+
+def _add_appointments(database, count, first_telegram_id=7000, start=None):
+    start = start or datetime.datetime.now() + datetime.timedelta(hours=1)
+    session = database.get_session()
+    try:
+        for i in range(count):
+            user = database.User(telegram_id=first_telegram_id + i, name=f"U{i}", phone="6", email="u@x.es", address="C")
+            session.add(user)
+            session.flush()
+            session.add(database.Appointment(user_id=user.id, date=start + datetime.timedelta(minutes=i)))
+        session.commit()
+    finally:
+        session.close()
+
+
+def _run(handlers, bot):
+    asyncio.run(asyncio.wait_for(handlers.send_appointment_reminders(SimpleNamespace(bot=bot)), timeout=5))
+
+
+def test_transient_failures_are_retried_in_a_later_run(reminders):
+    _add_appointments(reminders.database, 7)
+    bot = _Bot(blocked={7000}, offline=set(range(7001, 7007)))
+
+    _run(reminders.handlers, bot)
+
+    # Un intento por cita aunque el lote (5) se llene de fallos temporales
+    assert bot.attempts == 7
+    stats = reminders.handlers.reminder_stats
+    assert (stats['sent'], stats['failed'], stats['retried']) == (0, 1, 6)
+
+    # En la pasada siguiente se envían las que fallaron por la red; la bloqueada no
+    bot = _Bot()
+    _run(reminders.handlers, bot)
+    assert bot.attempts == 6
+    assert stats['sent'] == 6
+
+
+def test_lag_uses_local_time_for_created_at(reminders, monkeypatch):
+    monkeypatch.setenv("TZ", "Pacific/Kiritimati")  # UTC+14
+    time.tzset()
+    try:
+        now = datetime.datetime.now()
+        appointment = {
+            'date': now + datetime.timedelta(hours=1),
+            # Creada hace un minuto, ya dentro de la ventana del recordatorio
+            'created_at': datetime.datetime.utcnow() - datetime.timedelta(minutes=1),
+        }
+        assert 50 <= reminders.handlers.reminder_lag(appointment, now) <= 70
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_metrics_text_includes_reminders(reminders):
+    _add_appointments(reminders.database, 2)
+    _run(reminders.handlers, _Bot())
+
+    text = reminders.handlers.get_metrics_text()
+    assert "bot_reminders_sent_total 2" in text
+    assert "bot_reminder_max_lag_seconds" in text
@@ -0,0 +1,92 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+HOLD = datetime.timedelta(minutes=15)
+STOCK = 10
+BUYERS = 40
+
+
+@pytest.fixture
+def database(make_database):
+    database = make_database()
+    database.add_product("Pantalón", "Vaquero", 40.0, None, "pantalones", STOCK)
+    return database
+
+
+def _listed_stock(database):
+    (product,) = database.get_products("pantalones")
+    return product['stock']
+
+
+def _stock(database, product_id):
+    with database.get_engine().connect() as conn:
+        return conn.execute(
+            database.select(database.products_table.c.stock).where(database.products_table.c.id == product_id)
+        ).scalar_one()
+
+
+def test_concurrent_reservations_never_oversell(database):
+    product_id = database.get_products("pantalones")[0]['id']
+    barrier = threading.Barrier(BUYERS)
+
+    def buy(buyer):
+        barrier.wait()
+        quantity = buyer % 3 + 1
+        return quantity if database.reserve_stock(9000 + buyer, product_id, quantity, HOLD) else 0
+
+    with ThreadPoolExecutor(max_workers=BUYERS) as executor:
+        reserved = sum(executor.map(buy, range(BUYERS)))
+
+    stock = _stock(database, product_id)
+    assert stock >= 0
+    assert reserved + stock == STOCK
+    assert _listed_stock(database) == stock
+
+
+def test_listing_follows_reservations_and_releases(database):
+    product_id = database.get_products("pantalones")[0]['id']
+    assert _listed_stock(database) == STOCK  # queda en la caché
+
+    assert database.reserve_stock(1, product_id, 2, HOLD)
+    assert _listed_stock(database) == STOCK - 2
+
+    assert database.cancel_reservations(1) == 2
+    assert _listed_stock(database) == STOCK
+
+    assert database.reserve_stock(2, product_id, 3, HOLD)
+    assert _listed_stock(database) == STOCK - 3
+    assert database.release_expired_reservations(datetime.datetime.utcnow() + HOLD * 2) == 1
+    assert _listed_stock(database) == STOCK
+    assert database.search_products("pantalón")[0]['stock'] == STOCK
+
+
+def test_checkout_keeps_reserved_units_out_of_stock(database):
+    product_id = database.get_products("pantalones")[0]['id']
+    database.save_user(3, "Ana", "600000000", "ana@example.com", "Calle 1")
+    assert database.reserve_stock(3, product_id, 2, HOLD)
+
+    order = database.checkout(3)
+    assert order['items'] == [{'product_id': product_id, 'quantity': 2, 'price': 40.0}]
+    assert _listed_stock(database) == STOCK - 2
+    # Las unidades vendidas ya no vuelven al stock al liberar reservas caducadas
+    assert database.release_expired_reservations(datetime.datetime.utcnow() + HOLD * 2) == 0
+    assert _listed_stock(database) == STOCK - 2
+
+
+def test_reservation_limits_per_product_and_per_user(database):
+    product_id = database.get_products("pantalones")[0]['id']
+    database.add_product("Camisa", None, 20.0, None, "camisas", STOCK)
+    other_id = database.get_products("camisas")[0]['id']
+    limits = {'max_per_product': 3, 'max_per_user': 5}
+
+    assert database.reserve_stock(4, product_id, 2, HOLD, **limits)
+    assert database.reserve_stock(4, product_id, 2, HOLD, **limits) is None
+    assert database.reserve_stock(4, product_id, 1, HOLD, **limits)
+    assert database.reserve_stock(4, other_id, 3, HOLD, **limits) is None
+    assert database.reserve_stock(4, other_id, 2, HOLD, **limits)
+    # Un rechazo por límite no toca el stock
+    assert _stock(database, product_id) == STOCK - 3
+    assert _stock(database, other_id) == STOCK - 2
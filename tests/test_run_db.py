@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+SLEEP = 0.2
+
+
+def test_slow_calls_run_in_parallel_off_the_event_loop(make_database):
+    database = make_database(DB_MAX_WORKERS="4")
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(database.run_db(time.sleep, SLEEP) for _ in range(4)))
+        elapsed = time.perf_counter() - start
+        ticker_task.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    # Cuatro esperas a la vez tardan lo que una, no lo que las cuatro seguidas
+    assert elapsed < SLEEP * 2
+    # Y mientras tanto el bucle de eventos sigue atendiendo otras tareas
+    assert ticks >= SLEEP / 0.01 / 2
+
+
+def test_pool_size_bounds_concurrency(make_database):
+    database = make_database(DB_MAX_WORKERS="2")
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(database.run_db(time.sleep, SLEEP) for _ in range(4)))
+        return time.perf_counter() - start
+
+    # Con dos hilos, cuatro esperas necesitan dos turnos
+    assert asyncio.run(main()) >= SLEEP * 2
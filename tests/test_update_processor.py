@@ -0,0 +1,74 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from update_processor import ChatOrderedUpdateProcessor
+
+CHATS = 5
+UPDATES_PER_CHAT = 20
+
+
+def _update(chat_id, sequence):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None, sequence=sequence)
+
+
+async def _run(max_running):
+    processor = ChatOrderedUpdateProcessor(max_running)
+    rng = random.Random(19)
+    handled = {chat_id: [] for chat_id in range(CHATS)}
+    running = {chat_id: 0 for chat_id in range(CHATS)}
+    state = {'running': 0, 'max_running': 0, 'max_chat_running': 0}
+
+    async def handle(update, delay):
+        chat_id = update.effective_chat.id
+        running[chat_id] += 1
+        state['running'] += 1
+        state['max_running'] = max(state['max_running'], state['running'])
+        state['max_chat_running'] = max(state['max_chat_running'], running[chat_id])
+        handled[chat_id].append(update.sequence)
+        await asyncio.sleep(delay)
+        running[chat_id] -= 1
+        state['running'] -= 1
+
+    # Actualizaciones de todos los chats intercaladas al azar, en el orden en que "llegan"
+    arrivals = _interleave(
+        [_update(chat_id, sequence) for chat_id in range(CHATS) for sequence in range(UPDATES_PER_CHAT)], rng
+    )
+
+    await processor.initialize()
+    # Como Application: una tarea por actualización, creadas en orden de llegada
+    await asyncio.gather(*(
+        asyncio.create_task(processor.process_update(update, handle(update, rng.uniform(0, 0.01))))
+        for update in arrivals
+    ))
+    await processor.shutdown()
+    return handled, state
+
+
+def _interleave(updates, rng):
+    """Mezcla los chats conservando el orden de las actualizaciones de cada uno"""
+    queues = {}
+    for update in updates:
+        queues.setdefault(update.effective_chat.id, []).append(update)
+    result = []
+    while queues:
+        chat_id = rng.choice(list(queues))
+        result.append(queues[chat_id].pop(0))
+        if not queues[chat_id]:
+            del queues[chat_id]
+    return result
+
+
+def test_each_chat_is_handled_in_arrival_order():
+    handled, state = asyncio.run(_run(max_running=4))
+
+    for chat_id, sequences in handled.items():
+        assert sequences == list(range(UPDATES_PER_CHAT)), chat_id
+    # Nunca hay dos actualizaciones del mismo chat a la vez
+    assert state['max_chat_running'] == 1
+
+
+def test_different_chats_run_concurrently_up_to_the_limit():
+    _, state = asyncio.run(_run(max_running=4))
+
+    assert 1 < state['max_running'] <= 4
@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+
+def test_lookup_racing_save_user_is_not_cached(make_database):
+    database = make_database()
+    saved = []
+
+    def save_after_select(conn, cursor, statement, parameters, context, executemany):
+        # Otro hilo da de alta al usuario justo después de la consulta de get_user
+        if not saved and statement.lstrip().startswith("SELECT") and "FROM users" in statement:
+            saved.append(database.save_user(5001, "Ana", "600111222", "ana@example.com", "Calle 1"))
+
+    event.listen(database.get_engine(), "after_cursor_execute", save_after_select)
+    try:
+        # La consulta vio la base de datos antes del alta: devuelve None, pero no lo cachea
+        assert database.get_user(5001) is None
+    finally:
+        event.remove(database.get_engine(), "after_cursor_execute", save_after_select)
+    assert saved == [True]
+    assert database.get_user(5001)['name'] == "Ana"
+
+
+def test_set_is_discarded_after_invalidation():
+    from cache import MISSING, TTLCache
+
+    cache = TTLCache(maxsize=2)
+    generation = cache.generation()
+    cache.invalidate("a")
+    assert cache.set("a", "viejo", generation) is False
+    assert cache.get("a") is MISSING
+    assert cache.set("b", "nuevo", generation) is True
+
+    # Si el registro de invalidaciones se desborda, las marcas antiguas no se aceptan
+    for key in ("c", "d", "e"):
+        cache.invalidate(key)
+    assert cache.set("b", "nuevo", generation) is False
+    assert cache.set("b", "nuevo", cache.generation()) is True
@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import pytest
+
+SECRET = "s3cret-token"
+USER_ID = 424242
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("la condición no se cumplió a tiempo")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def webhook(make_database):
+    make_database()
+    from app import build_application
+    from fake_telegram import FakeBotRequest, FakeTelegramClient
+    from webhook import create_webhook_app
+
+    request = FakeBotRequest()
+    application = build_application(token="1:fake", request=request, updater=False, persistent=False)
+    api = create_webhook_app(application, secret_token=SECRET)
+
+    def client(secret_token=SECRET):
+        return FakeTelegramClient("http://bot.test", secret_token=secret_token, transport=httpx.ASGITransport(app=api))
+
+    async def run(scenario):
+        # ASGITransport no ejecuta el lifespan: se arranca la aplicación a mano
+        async with api.router.lifespan_context(api):
+            await scenario(client, request)
+
+    return run
+
+
+def test_wrong_secret_token_is_rejected(webhook):
+    async def scenario(client, request):
+        for secret_token in ("otro-token", None):
+            telegram = client(secret_token)
+            assert await telegram.send_text(USER_ID, "/start") == 403
+            await telegram.aclose()
+        await asyncio.sleep(0.05)
+        assert request.calls_to("sendMessage") == []
+
+    asyncio.run(webhook(scenario))
+
+
+def test_start_update_replies_with_registration_prompt(webhook):
+    async def scenario(client, request):
+        telegram = client()
+        assert await telegram.send_text(USER_ID, "/start") == 200
+        await _wait_for(lambda: len(request.calls_to("sendMessage")) >= 2)
+        await telegram.aclose()
+
+        greeting, prompt = request.calls_to("sendMessage")[:2]
+        assert greeting["chat_id"] == USER_ID
+        assert greeting["text"].startswith(f"¡Hola user{USER_ID}!")
+        assert prompt["text"] == "Por favor, introduce tu nombre completo:"
+
+    asyncio.run(webhook(scenario))